@@ -0,0 +1,78 @@
+"""
+Show that the event loop keeps serving updates while DB writes are in flight.
+
+A heartbeat task stands in for other cadets' updates and records how late it
+wakes up. Writers book and check in cadets either by calling the helpers
+directly (the old blocking path) or through AsyncDatabase.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.async_db_bench
+"""
+import argparse
+import asyncio
+import time
+
+from bench.fixtures import make_database, use_database
+from db.async_db import AsyncDatabase
+
+TICK = 0.005
+
+
+async def heartbeat(stop, lags):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def write(main, db, cadet_id, blocking):
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    if blocking:
+        main.writes.run(main.record_booking, cadet_id, 1, None, None, now, 1)
+        main.writes.run(main.record_check_in, now, 2, cadet_id)
+    else:
+        await db.run(main.writes.run, main.record_booking, cadet_id, 1, None, None, now, 1)
+        await db.run(main.writes.run, main.record_check_in, now, 2, cadet_id)
+
+
+async def run(main, writers, blocking):
+    db = AsyncDatabase(max_workers=4, max_pending=32)
+    stop = asyncio.Event()
+    lags = []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(TICK * 2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(write(main, db, i % 100 + 1, blocking) for i in range(writers)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await beat
+    db.close()
+    lags.sort()
+    return {
+        "writes": writers * 2,
+        "elapsed_s": round(elapsed, 3),
+        "heartbeats": len(lags),
+        "p50_lag_ms": round(lags[len(lags) // 2] * 1000, 2),
+        "max_lag_ms": round(lags[-1] * 1000, 2),
+        "queue": db.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    bot = use_database(make_database(cadets=100, srt_rows=args.rows))
+    bot.pool.pragmas += ("PRAGMA synchronous = FULL",)
+
+    for blocking in (True, False):
+        label = "blocking helpers" if blocking else "AsyncDatabase"
+        print(label, asyncio.run(run(bot, args.writers, blocking)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Closing the day: one set-based close_day against checking cadets out one by one.
+
+Every cadet gets a booking; `--ongoing` of them have checked in and the rest
+never started. Both approaches run on copies of the same database, and the
+rollups are compared with a full rebuild afterwards.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.auto_checkout_bench --cadets 5000
+"""
+import argparse
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from bench.fixtures import make_database, use_database
+from db import rollups
+
+
+def open_day(bot, path, cadets, ongoing):
+    now = datetime.now().replace(microsecond=0)
+    booked = (now - timedelta(hours=2)).strftime("%Y-%m-%d %H:%M:%S")
+    started = (now - timedelta(minutes=45)).strftime("%Y-%m-%d %H:%M:%S")
+    with bot.pool.connection() as conn:
+        conn.execute("BEGIN")
+        for cadet_id in range(1, cadets + 1):
+            bot.record_booking(conn, cadet_id, 1 + cadet_id % 4, None, None, booked, 1)
+            if cadet_id <= ongoing:
+                bot.record_check_in(conn, started, 2, cadet_id)
+        conn.commit()
+
+
+def rollup_matches_rebuild(path):
+    conn = sqlite3.connect(path)
+    incremental = conn.execute("SELECT * FROM srt_daily_rollup ORDER BY 1, 2, 3").fetchall()
+    rollups.rebuild(conn)
+    rebuilt = conn.execute("SELECT * FROM srt_daily_rollup ORDER BY 1, 2, 3").fetchall()
+    conn.close()
+    return incremental == rebuilt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=5000)
+    parser.add_argument("--ongoing", type=int, default=None,
+                        help="cadets still checked in at the cutoff (default: 80%%)")
+    parser.add_argument("--history", type=int, default=50000)
+    args = parser.parse_args()
+    ongoing = int(args.cadets * 0.8) if args.ongoing is None else args.ongoing
+
+    path = make_database(cadets=args.cadets, srt_rows=args.history)
+    bot = use_database(path)
+    bot.refdata.reload()
+    open_day(bot, path, args.cadets, ongoing)
+    bot.pool.close()
+    copy = path + ".per-cadet"
+    shutil.copyfile(path, copy)
+    cutoff = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    bot = use_database(copy)
+    started = time.perf_counter()
+    with bot.pool.connection() as conn:
+        cadet_ids = [row[0] for row in conn.execute(
+            "SELECT cadet_id FROM srt_current WHERE status_id = 2")]
+        for cadet_id in cadet_ids:
+            bot.record_check_out(conn, cadet_id=cadet_id, datetime_out=cutoff, status_id=3)
+            conn.commit()
+    per_cadet = time.perf_counter() - started
+    bot.pool.close()
+    print(f"per cadet:  {len(cadet_ids)} check-outs in {per_cadet * 1000:8.1f} ms, "
+          f"rollups match rebuild: {rollup_matches_rebuild(copy)}")
+
+    bot = use_database(path)
+    started = time.perf_counter()
+    touched = bot.writes.run(bot.close_day, cutoff, 2, 3, 1)
+    close_day = time.perf_counter() - started
+    bot.writes.close()
+    bot.pool.close()
+    print(f"close_day:  {touched['checked_out']} check-outs in {close_day * 1000:8.1f} ms, "
+          f"rollups match rebuild: {rollup_matches_rebuild(path)}, {touched}")
+
+
+if __name__ == "__main__":
+    main()
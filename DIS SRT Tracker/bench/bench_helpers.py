@@ -0,0 +1,265 @@
+"""
+Micro-benchmarks for every DB helper in main.py, the reference data lookups
+and the booking mutations the handlers queue on the write queue.
+
+Each helper is timed against generated databases with 1k, 10k and 100k
+srt_info rows. Results go to a JSON file and are compared against a stored
+baseline, so a schema, index or query change shows its cost per helper.
+
+Timings are only comparable on the machine that recorded them. Record a
+baseline locally from the commit you are changing before comparing; a
+baseline from another host is compared anyway, with a warning. A baseline
+is measured in several processes, since a helper's speed varies more
+between processes than within one.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.bench_helpers --save-baseline      # record a new baseline
+    python -m bench.bench_helpers                      # compare with bench/baseline.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench.fixtures import make_database, use_database
+from db.srt_info import record_booking, record_check_in, record_check_out
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+CADETS = 2000
+# Below this the call loop's own overhead decides the timing
+RESOLUTION_US = 1.0
+
+
+def helper_cases(bot):
+    """Return [(name, zero-argument callable)] covering every DB helper."""
+    telegram_ids = itertools.cycle(range(100001, 100001 + CADETS))
+    cadet_ids = itertools.cycle(range(1, CADETS + 1))
+    new_telegram_ids = itertools.count(900000)
+    new_cadet_ids = itertools.count(CADETS + 1)
+    # insert_cadet_into_no_group puts the cadets added by insert_cadet into group 1
+    ungrouped_cadet_ids = itertools.count(CADETS + 1)
+    joined_cadet_ids = itertools.count(1)
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def uncached(func):
+        def call():
+            bot.identities.invalidate()
+            return func(next(telegram_ids))
+        return call
+
+    return [
+        ("lookup_cadet", lambda: bot.lookup_cadet(next(telegram_ids))),
+        ("lookup_cadet (cache miss)", uncached(bot.lookup_cadet)),
+        ("load_cadet", lambda: bot.load_cadet(next(telegram_ids))),
+        ("get_cadet_id_by_tele_id", lambda: bot.get_cadet_id_by_tele_id(next(telegram_ids))),
+        ("insert_cadet", lambda: bot.insert_cadet(
+            next(new_telegram_ids), None, f"Bench {next(new_cadet_ids)}")),
+        ("refdata.activities", bot.refdata.activities),
+        ("refdata.status_id", lambda: bot.refdata.status_id("Ongoing")),
+        ("refdata.activity_id", lambda: bot.refdata.activity_id("Gym - Wingline")),
+        ("record_booking", lambda: bot.writes.run(record_booking, next(cadet_ids), 1, None, None, now, 1)),
+        ("record_check_in", lambda: bot.writes.run(record_check_in, now, 2, next(cadet_ids))),
+        ("record_check_out", lambda: bot.writes.run(record_check_out, now, 3, next(cadet_ids))),
+        ("get_cadet_dashboard", lambda: bot.get_cadet_dashboard(next(telegram_ids))),
+        ("check_status_exists", lambda: bot.check_status_exists(next(cadet_ids))),
+        ("get_group_chat_id", lambda: bot.get_group_chat_id(-100)),
+        ("get_group_id", lambda: bot.get_group_id(-100)),
+        ("add_group", lambda: bot.add_group(-100, "Bench group")),
+        ("check_if_cadet_in_no_group", lambda: bot.check_if_cadet_in_no_group(next(cadet_ids))),
+        ("insert_cadet_into_no_group", lambda: bot.insert_cadet_into_no_group(next(ungrouped_cadet_ids))),
+        ("check_if_cadet_in_group", lambda: bot.check_if_cadet_in_group(next(cadet_ids), 1)),
+        ("add_cadet_group", lambda: bot.add_cadet_group(next(joined_cadet_ids), 2)),
+        ("get_roster", bot.get_roster),
+        ("get_report (week)", lambda: bot.get_report("week")),
+    ]
+
+
+def measure(func, number, repeat):
+    """Return timing and allocation stats for one helper."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()  # warm up the connection and statement cache
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            runs.append((time.perf_counter() - started) / number)
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(number):
+            func()
+        peak = tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+
+    return {
+        "median_us": round(statistics.median(runs) * 1e6, 1),
+        "min_us": round(min(runs) * 1e6, 1),
+        "peak_alloc_kib": round(peak / 1024, 1),
+    }
+
+
+def run(sizes, number, repeat, only, names=None):
+    results = {}
+    for rows in sizes:
+        bot = use_database(make_database(cadets=CADETS, srt_rows=rows))
+        bot.refdata.reload()
+        results[str(rows)] = {}
+        for name, func in helper_cases(bot):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            if names is not None and name not in names:
+                continue
+            stats = measure(func, number, repeat)
+            results[str(rows)][name] = stats
+            print(f"{rows:>7} rows  {name:<36}{stats['median_us']:>10} us"
+                  f"{stats['peak_alloc_kib']:>10} KiB")
+        bot.writes.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print each helper's median against the baseline median and return
+    [(rows, name)] for those that regressed.
+
+    A helper regresses when its median grows by more than `tolerance` of the
+    baseline median plus the baseline's own spread (median minus fastest
+    run), so a helper that was noisy when recorded needs a larger slowdown
+    to be flagged than a steady one. Helpers answered from memory in well
+    under RESOLUTION_US are only flagged once they grow past it.
+    """
+    regressions = []
+    for rows, helpers in results.items():
+        for name, stats in helpers.items():
+            old = baseline.get(rows, {}).get(name)
+            if not old:
+                continue
+            ratio = stats["median_us"] / old["median_us"] if old["median_us"] else 1.0
+            allowed = max(old["median_us"] * tolerance + (old["median_us"] - old["min_us"]),
+                          RESOLUTION_US)
+            marker = ""
+            if stats["median_us"] - old["median_us"] > allowed:
+                regressions.append((rows, name))
+                marker = "  REGRESSION"
+            print(f"{rows:>7} rows  {name:<36}{old['median_us']:>10} -> "
+                  f"{stats['median_us']:>10} us  ({ratio:5.2f}x){marker}")
+    return regressions
+
+
+def run_in_process(sizes, number, repeat, only=None):
+    """run() in a fresh interpreter; returns its results."""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "results.json")
+        command = [sys.executable, "-m", "bench.bench_helpers", "--sizes", *map(str, sizes),
+                   "--number", str(number), "--repeat", str(repeat),
+                   "--output", output, "--baseline", os.path.join(tmp, "none.json")]
+        if only:
+            command += ["--only", *only]
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        with open(output) as f:
+            return json.load(f)["results"]
+
+
+def combine(runs):
+    """
+    Merge results from several processes: the median of their medians, and
+    the fastest run any of them saw, so (median - min) covers the spread
+    between processes as well as within one.
+    """
+    combined = {}
+    for rows, helpers in runs[0].items():
+        combined[rows] = {}
+        for name in helpers:
+            stats = [run[rows][name] for run in runs if name in run.get(rows, {})]
+            combined[rows][name] = {
+                "median_us": round(statistics.median(s["median_us"] for s in stats), 1),
+                "min_us": min(s["min_us"] for s in stats),
+                "peak_alloc_kib": max(s["peak_alloc_kib"] for s in stats),
+            }
+    return combined
+
+
+def remeasure(regressions, number, repeat):
+    """
+    Time the regressed helpers again in a fresh interpreter.
+
+    The same helper can settle 30-50% apart from one process to the next on
+    a busy host, while staying steady within a process, so a slow run only
+    counts as a regression if another process sees it too.
+    """
+    by_rows = {}
+    for rows, name in regressions:
+        by_rows.setdefault(rows, set()).add(name)
+    remeasured = {}
+    for rows, names in by_rows.items():
+        helpers = run_in_process([rows], number, repeat, names)[rows]
+        remeasured[rows] = {name: helpers[name] for name in names}
+    return remeasured
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--number", type=int, default=50, help="calls per timing run")
+    parser.add_argument("--repeat", type=int, default=15, help="timing runs per helper")
+    parser.add_argument("--only", nargs="*", help="only helpers whose name contains one of these")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--processes", type=int, default=3,
+                        help="interpreters a new baseline is measured in")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown of the median, on top of the baseline's spread")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.number, args.repeat, args.only)
+    if args.save_baseline and args.processes > 1:
+        print(f"Measuring in {args.processes - 1} more processes for the baseline")
+        results = combine([results] + [run_in_process(args.sizes, args.number, args.repeat, args.only)
+                                       for _ in range(args.processes - 1)])
+    document = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored.get("host") != document["host"]:
+            print(f"Warning: {args.baseline} was recorded on {stored.get('host', 'another host')}; "
+                  "record a local one with --save-baseline for meaningful numbers")
+        baseline = stored["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Measuring the {len(regressions)} regressed helpers again")
+            remeasured = remeasure(regressions, args.number, args.repeat)
+            for rows, helpers in remeasured.items():
+                for name, stats in helpers.items():
+                    helpers[name] = min(stats, results[rows][name], key=lambda s: s["median_us"])
+            if compare(remeasured, baseline, args.tolerance):
+                sys.exit(1)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+
+if __name__ == "__main__":
+    main()
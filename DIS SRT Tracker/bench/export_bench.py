@@ -0,0 +1,62 @@
+"""
+History export throughput and memory for db.exporter.
+
+Builds a database with `--history` srt_info rows over 30 days and exports
+it as CSV, JSON Lines and gzipped CSV, then exports growing date ranges
+with tracemalloc on to show peak memory does not grow with the row count.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.export_bench --history 200000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+
+from bench.fixtures import make_database, use_database
+from db import exporter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=200000)
+    args = parser.parse_args()
+
+    path = make_database(cadets=args.cadets, srt_rows=args.history)
+    use_database(path).pool.close()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO 'group' (tele_id, name) VALUES (-4001, 'Flight 1')")
+    conn.execute("INSERT INTO cadet_group (cadet_id, group_id) "
+                 "SELECT cadet_id, (SELECT group_id FROM 'group' WHERE tele_id = -4001) "
+                 "FROM cadet WHERE cadet_id % 10 = 0")
+    conn.commit()
+    directory = tempfile.mkdtemp(prefix="srt-export-")
+
+    for name, fmt in (("history.csv", "csv"), ("history.jsonl", "jsonl"),
+                      ("history.csv.gz", "csv")):
+        output = os.path.join(directory, name)
+        result = exporter.export(conn, output, fmt)
+        print(f"{name:<16} {result['rows']:>8} rows in {result['seconds']:6.2f}s "
+              f"({result['rows_per_s']:>8,} rows/s) {os.path.getsize(output) / 2 ** 20:7.1f} MiB")
+
+    result = exporter.export(conn, os.path.join(directory, "flight.csv"), group="Flight 1",
+                             activity="1")
+    print(f"group and activity filter: {result['rows']} rows in {result['seconds']:.2f}s")
+
+    today = date.today()
+    for days in (3, 15, 30):
+        tracemalloc.start()
+        result = exporter.export(conn, os.path.join(directory, "range.jsonl.gz"), "jsonl",
+                                 since=today - timedelta(days=days - 1), until=today)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"last {days:>2} days: {result['rows']:>8} rows, "
+              f"peak Python memory {peak / 1024:7.1f} KiB")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
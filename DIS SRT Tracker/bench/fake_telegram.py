@@ -0,0 +1,156 @@
+"""
+Offline stand-in for the Telegram Bot API, plus builders for synthetic updates.
+
+FakeRequest answers every Bot API call locally, so an Application built with
+it never touches the network:
+
+    builder = Application.builder().token(FAKE_TOKEN).request(FakeRequest())
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter, defaultdict, deque
+
+from telegram.error import NetworkError
+from telegram.request import BaseRequest
+
+FAKE_TOKEN = "123456:offline-load-test"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "SRT Bot", "username": "srt_bot"}
+GROUP_CHAT_ID = -1001
+
+
+class FakeRequest(BaseRequest):
+    """
+    Answer Bot API calls from memory, optionally failing some of them the
+    way Telegram and the network do.
+
+    Args:
+        latency (float): Seconds to sleep per call, to mimic the network.
+        jitter (float): Up to this many extra seconds per call, so calls can overtake.
+        chat_limit (int): Requests one chat accepts per second before answering 429.
+        global_limit (int): Requests the bot may make per second before answering 429.
+        error_rate (float): Fraction of calls that fail with a NetworkError.
+        seed (int): Random seed for jitter and injected errors.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, chat_limit=None, global_limit=None,
+                 error_rate=0.0, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.chat_limit = chat_limit
+        self.global_limit = global_limit
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.failures = Counter()
+        self.sent = []
+        self._message_ids = itertools.count(1000)
+        self._rng = random.Random(seed)
+        self._recent = defaultdict(deque)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.calls[endpoint] += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._rng.random() * self.jitter)
+
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.failures["network"] += 1
+            raise NetworkError("Injected network error")
+        if self._flooded(params.get("chat_id")):
+            self.failures["flood"] += 1
+            return 429, json.dumps({
+                "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }).encode()
+
+        self.sent.append((time.monotonic(), endpoint, params))
+        return 200, json.dumps({"ok": True, "result": self._result(endpoint, params)}).encode()
+
+    def _flooded(self, chat_id):
+        """Count the request against the last second's limits; True if over one."""
+        if chat_id is None:
+            return False
+        now = time.monotonic()
+        for key, limit in ((chat_id, self.chat_limit), (None, self.global_limit)):
+            if limit is None:
+                continue
+            recent = self._recent[key]
+            while recent and recent[0] <= now - 1:
+                recent.popleft()
+            if len(recent) >= limit:
+                return True
+        for key in (chat_id, None):
+            self._recent[key].append(now)
+        return False
+
+    def _result(self, endpoint, params):
+        if endpoint == "getMe":
+            return BOT_USER
+        if endpoint in ("sendMessage", "editMessageText"):
+            chat_id = params.get("chat_id", 0)
+            return {
+                "message_id": params.get("message_id") or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        return True
+
+
+_update_ids = itertools.count(1)
+
+
+def _user(telegram_id):
+    return {"id": telegram_id, "is_bot": False, "first_name": f"Cadet{telegram_id}",
+            "username": f"cadet{telegram_id}"}
+
+
+def message_update(telegram_id, text, chat_id=None, chat_type="private"):
+    """Build the dict for a text message or command update."""
+    chat_id = chat_id or telegram_id
+    message = {
+        "message_id": next(_update_ids),
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": chat_type, "title": "Load test flight"}
+        if chat_type != "private" else {"id": chat_id, "type": "private"},
+        "from": _user(telegram_id),
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": next(_update_ids), "message": message}
+
+
+def callback_update(telegram_id, data, message_id=1):
+    """Build the dict for an inline button press in the cadet's private chat."""
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(telegram_id),
+            "chat_instance": str(telegram_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": telegram_id, "type": "private"},
+                "from": BOT_USER,
+                "text": "What would you like to do?",
+            },
+        },
+    }
@@ -0,0 +1,85 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+# Schema and reference rows are taken from the checked-in database
+TEMPLATE_DB = os.path.join(os.path.dirname(__file__), "..", "db", "srt.db")
+
+
+def make_database(cadets=100, srt_rows=0, days=30, seed=1):
+    """
+    Copy the template database into a temp dir and fill it with synthetic data.
+
+    Args:
+        cadets (int): Number of cadets to register.
+        srt_rows (int): Number of srt_info history rows spread over `days`.
+        days (int): How far back the generated history goes.
+        seed (int): Random seed so runs are comparable.
+
+    Returns:
+        str: Path to the generated database file.
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="srt-bench-"), "srt.db")
+    shutil.copyfile(TEMPLATE_DB, path)
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM srt_info")
+    conn.execute("DELETE FROM cadet_group")
+    conn.execute("DELETE FROM cadet")
+    activity_ids = [row[0] for row in conn.execute("SELECT activity_id FROM activity")]
+
+    conn.executemany(
+        "INSERT INTO cadet (cadet_id, telegram_id, telegram_username, name) VALUES (?, ?, ?, ?)",
+        ((i, 100000 + i, f"user{i}", f"Cadet {i}") for i in range(1, cadets + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO cadet_group (cadet_id, group_id) VALUES (?, 1)",
+        ((i,) for i in range(1, cadets + 1)),
+    )
+
+    now = datetime.now().replace(microsecond=0)
+
+    def history():
+        for _ in range(srt_rows):
+            created = now - timedelta(days=rng.randrange(days), minutes=rng.randrange(600))
+            status_id = rng.choice((1, 2, 3, 3, 3))
+            datetime_in = created + timedelta(minutes=5) if status_id > 1 else None
+            datetime_out = datetime_in + timedelta(minutes=45) if status_id == 3 else None
+            yield (
+                rng.randint(1, cadets),
+                rng.choice(activity_ids),
+                datetime_in and datetime_in.strftime("%Y-%m-%d %H:%M:%S"),
+                datetime_out and datetime_out.strftime("%Y-%m-%d %H:%M:%S"),
+                created.strftime("%Y-%m-%d %H:%M:%S"),
+                status_id,
+            )
+
+    conn.executemany(
+        """
+        INSERT INTO srt_info (cadet_id, activity_id, datetime_in, datetime_out, created_on, status_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        history(),
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def use_database(path, **pool_kwargs):
+    """Point main.py's helpers at a migrated `path` and return the main module."""
+    import main
+    from db.connection import ConnectionPool
+    from db.migrations import migrate
+
+    main.pool.close()
+    pool_kwargs.setdefault("factory", main.pool.factory)
+    pool_kwargs.setdefault("pragmas", main.pool.pragmas)
+    main.pool = ConnectionPool(path, **pool_kwargs)
+    with main.pool.connection() as conn:
+        migrate(conn)
+    return main
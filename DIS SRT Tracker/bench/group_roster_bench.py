@@ -0,0 +1,81 @@
+"""
+Check that a group's roster costs what the group's size costs, not what the
+number of registered cadets costs.
+
+Every cadet has an open booking. The first sweep keeps one group at
+`--group-size` members while the registered cadets grow; the second keeps
+the cadets fixed and grows the group. Both time get_roster for the group
+next to the unscoped get_roster, and the run exits non-zero if the group's
+roster slows down more than `--max-growth` times while the cadets grow.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.group_roster_bench --group-size 50
+"""
+import argparse
+import sqlite3
+import sys
+import timeit
+from datetime import datetime
+
+from bench.fixtures import make_database, use_database
+from db.migrations import migrate
+from db.srt_info import record_bookings
+
+GROUP_CHAT_ID = -3000
+
+
+def build(cadets, group_size):
+    """A migrated database with `cadets` open bookings and one group of `group_size` of them."""
+    path = make_database(cadets=cadets)
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    record_bookings(conn, ((cadet_id, 1 + cadet_id % 4, now, None, now, 2)
+                           for cadet_id in range(1, cadets + 1)))
+    group_id = conn.execute("INSERT INTO 'group' (tele_id, name) VALUES (?, 'Flight')",
+                            (GROUP_CHAT_ID,)).lastrowid
+    # Spread the members over the whole cadet table rather than the first rows
+    step = cadets // group_size
+    conn.executemany("INSERT INTO cadet_group (cadet_id, group_id) VALUES (?, ?)",
+                     ((1 + i * step, group_id) for i in range(group_size)))
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return path
+
+
+def measure(cadets, group_size, repeat):
+    bot = use_database(build(cadets, group_size))
+    bot.refdata.reload()
+    members = sum(len(rows) for _, rows in bot.get_roster(GROUP_CHAT_ID))
+    assert members == group_size, (members, group_size)
+    group_ms = min(timeit.repeat(lambda: bot.get_roster(GROUP_CHAT_ID), number=1, repeat=repeat)) * 1000
+    everyone_ms = min(timeit.repeat(bot.get_roster, number=1, repeat=repeat)) * 1000
+    print(f"{cadets:>8} cadets {group_size:>6} in group | group roster {group_ms:8.3f} ms"
+          f" | everyone {everyone_ms:8.3f} ms")
+    return group_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--group-size", type=int, default=50)
+    parser.add_argument("--cadets", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-growth", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"fixed group of {args.group_size}, growing cadet table")
+    fixed_group = [measure(cadets, args.group_size, args.repeat) for cadets in args.cadets]
+    print(f"fixed cadet table of {max(args.cadets)}, growing group")
+    for size in args.sizes:
+        measure(max(args.cadets), size, args.repeat)
+
+    growth = fixed_group[-1] / fixed_group[0]
+    print(f"group roster {growth:.2f}x slower with {max(args.cadets) // min(args.cadets)}x the cadets")
+    if growth > args.max_growth:
+        sys.exit(f"group roster grew {growth:.2f}x, more than {args.max_growth}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Bulk import throughput and memory for db.importer.
+
+Writes a groups CSV and a cadets CSV with `--cadets` rows (a few of them
+invalid or clashing on name), imports them into a fresh database, imports
+the cadets again to show the upsert leaves existing rows alone, and checks a
+dry run changes nothing. Peak Python memory of a dry run is measured at
+several file sizes; it should stay flat as the file grows.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.import_bench --cadets 50000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from bench.fixtures import make_database
+from db import importer
+
+
+def write_csvs(directory, cadets, groups):
+    groups_path = os.path.join(directory, "groups.csv")
+    with open(groups_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("group_chat_id", "name"))
+        writer.writerows((-3000 - i, f"Flight {i}") for i in range(groups))
+
+    cadets_path = os.path.join(directory, f"cadets-{cadets}.csv")
+    with open(cadets_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("telegram_id", "name", "telegram_username", "group_chat_id"))
+        for i in range(cadets):
+            if i % 5000 == 4999:
+                writer.writerow(("not-a-number", f"Bad Row {i}", "", ""))
+            elif i % 5000 == 2499:
+                # Same name as the first cadet: rejected by UNIQUE (name)
+                writer.writerow((700000 + i, "Intake Cadet 0", "", ""))
+            else:
+                writer.writerow((700000 + i, f"Intake Cadet {i}", f"intake{i}", -3000 - i % groups))
+    return groups_path, cadets_path
+
+
+def table_counts(conn):
+    return tuple(conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                 for table in ("cadet", "'group'", "cadet_group"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=50000)
+    parser.add_argument("--groups", type=int, default=40)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="srt-import-")
+    groups_path, cadets_path = write_csvs(directory, args.cadets, args.groups)
+    conn = importer.connect(make_database(cadets=0))
+
+    print(importer.import_groups(conn, groups_path, args.chunk_size).report("groups", False))
+    first = importer.import_cadets(conn, cadets_path, args.chunk_size)
+    print(first.report("cadets", False))
+    again = importer.import_cadets(conn, cadets_path, args.chunk_size)
+    print(again.report("cadets", False).splitlines()[0])
+
+    before = table_counts(conn)
+    importer.import_cadets(conn, cadets_path, args.chunk_size, dry_run=True)
+    unchanged = table_counts(conn) == before
+    print(f"dry run left the tables unchanged: {unchanged}, rows now {before}")
+
+    for size in sorted({args.cadets // 10, args.cadets // 2, args.cadets}):
+        _, path = write_csvs(directory, size, args.groups)
+        tracemalloc.start()
+        importer.import_cadets(conn, path, args.chunk_size, dry_run=True)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"dry run of {size:>7} rows: peak Python memory {peak / 1024:8.1f} KiB")
+    conn.close()
+
+    if not unchanged or again.inserted or again.updated:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Live roster fan-out: many groups following the roster while cadets use the bot.
+
+`--groups` group chats have a live roster message. Cadets book, check in and
+check out with a little think time between taps, so the roster keeps changing
+while their private menus are being edited. Everything goes through the
+OutboundScheduler and a FakeRequest that answers 429 above Telegram's limits.
+The run is repeated with every group edited at once and with the bounded
+fan-out, and reports the private handlers' latency, how many edits each group
+got and whether every group ended on the final roster.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.live_roster_bench --groups 100 --cadets 30
+"""
+import argparse
+import asyncio
+import random
+import sqlite3
+import time
+
+from telegram import Update
+from telegram.ext import Application
+
+from bench.fake_telegram import FAKE_TOKEN, FakeRequest, callback_update, message_update
+from bench.fixtures import make_database, use_database
+from bench.load_test import BOOK, CHECK_IN, CHECK_OUT, percentile
+from db.async_db import AsyncDatabase
+from live_roster import LiveRoster
+from outbound import OutboundScheduler
+from update_processor import CadetUpdateProcessor
+
+
+def add_live_groups(path, groups):
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO 'group' (tele_id, name, live_message_id) VALUES (?, ?, 1)",
+        ((-2000 - i, f"Flight {i}") for i in range(groups)))
+    # Every cadet is in every group, so each group's roster changes on every tap
+    conn.execute("""
+        INSERT INTO cadet_group (cadet_id, group_id)
+        SELECT cadet.cadet_id, 'group'.group_id FROM cadet, 'group' WHERE 'group'.tele_id <= -2000
+    """)
+    conn.commit()
+    conn.close()
+
+
+async def run(args, max_concurrent):
+    path = make_database(cadets=args.cadets)
+    bot = use_database(path)
+    # A fresh one per run: its semaphore binds to the event loop of the run that first waits on it
+    bot.db = AsyncDatabase(max_workers=4, max_pending=64)
+    bot.identities.invalidate()
+    bot.refdata.reload()
+    add_live_groups(path, args.groups)
+    bot.live_rosters = LiveRoster(
+        lambda chat_ids: bot.render_rosters(chat_ids),
+        lambda: bot.db.run(bot.get_live_rosters),
+        lambda chat_id: bot.db.run(bot.set_live_roster, chat_id, None),
+        debounce=args.debounce, max_concurrent=max_concurrent)
+
+    request = FakeRequest(latency=args.latency / 1000, chat_limit=args.chat_limit,
+                          global_limit=args.global_limit)
+    builder = (Application.builder().token(FAKE_TOKEN).request(request)
+               .get_updates_request(FakeRequest())
+               .concurrent_updates(CadetUpdateProcessor(args.cadets))
+               .rate_limiter(OutboundScheduler(backoff=0.05)))
+    app = bot.build_application(builder)
+    await app.initialize()
+    rng = random.Random(args.seed)
+    latencies = []
+
+    async def send(update, timed=True):
+        started = time.perf_counter()
+        await app.process_update(Update.de_json(update, app.bot))
+        if timed:
+            latencies.append(time.perf_counter() - started)
+
+    async def cadet(telegram_id):
+        await send(message_update(telegram_id, "/start"), timed=False)
+        for data in (BOOK, "activity_1", CHECK_IN, CHECK_OUT):
+            await asyncio.sleep(rng.random() * args.think)
+            await send(callback_update(telegram_id, data))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(cadet(100000 + i) for i in range(1, args.cadets + 1)))
+    elapsed = time.perf_counter() - started
+    while bot.live_rosters.stats()["scheduled"]:
+        await asyncio.sleep(0.05)
+    final_texts = await bot.render_rosters([-2000 - i for i in range(args.groups)])
+    await app.shutdown()
+    db_stats = bot.db.stats()
+    bot.db.close()
+
+    shown = {}
+    group_edits = 0
+    for _, endpoint, params in request.sent:
+        if endpoint == "editMessageText" and params["chat_id"] < 0:
+            group_edits += 1
+            shown[params["chat_id"]] = params["text"]
+    latencies.sort()
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+        "edits_per_group": round(group_edits / args.groups, 1),
+        "groups_current": sum(1 for chat_id, text in shown.items() if text == final_texts[chat_id]),
+        "flood_429": request.failures["flood"],
+        "live_roster": bot.live_rosters.stats(),
+        "db_peak_in_flight": db_stats["peak_in_flight"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--cadets", type=int, default=30)
+    parser.add_argument("--think", type=float, default=2.0, help="max seconds between taps")
+    parser.add_argument("--debounce", type=float, default=3.0)
+    parser.add_argument("--concurrency", type=int, default=4, help="bounded fan-out width")
+    parser.add_argument("--latency", type=float, default=20.0, help="ms per API call")
+    parser.add_argument("--chat-limit", type=int, default=3, help="requests per chat per second")
+    parser.add_argument("--global-limit", type=int, default=30, help="requests per second")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for name, width in (("all at once", args.groups), (f"bounded {args.concurrency}", args.concurrency)):
+        result = asyncio.run(run(args, width))
+        print(f"{name:<12} private taps p50 {result['p50_ms']:>7} ms  p95 {result['p95_ms']:>7} ms  "
+              f"max {result['max_ms']:>7} ms  {result['edits_per_group']} edits/group  "
+              f"{result['groups_current']}/{args.groups} groups current  "
+              f"{result['flood_429']} x 429")
+        print(f"             {result['live_roster']}, db peak in flight {result['db_peak_in_flight']}")
+    bot = use_database(make_database(cadets=0))
+    bot.writes.close()
+
+
+if __name__ == "__main__":
+    main()
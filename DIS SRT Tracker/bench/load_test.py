@@ -0,0 +1,156 @@
+"""
+Offline load test: drive the real ConversationHandler with synthetic cadets.
+
+Every cadet registers, then for each round books an activity, checks in and
+checks out; some of them also ask for the group roster. Bot API calls are
+answered by FakeRequest, so nothing leaves the machine.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.load_test --cadets 500 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+from telegram import Update
+from telegram.ext import Application
+
+from bench.fake_telegram import (FAKE_TOKEN, GROUP_CHAT_ID, FakeRequest,
+                                 callback_update, message_update)
+from bench.fixtures import make_database, use_database
+
+# Callback data sent by the menu buttons in main.py
+BOOK, CHECK_IN, CHECK_OUT, MAIN_MENU = "0", "2", "4", "5"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class LoadTest:
+    def __init__(self, bot, app, rounds, roster_ratio, seed):
+        self.bot = bot
+        self.app = app
+        self.rounds = rounds
+        self.roster_ratio = roster_ratio
+        self.rng = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.handler_errors = 0
+
+    async def send(self, step, update):
+        started = time.perf_counter()
+        await self.app.process_update(Update.de_json(update, self.app.bot))
+        self.latencies[step].append(time.perf_counter() - started)
+
+    async def cadet(self, telegram_id, slots):
+        activity_ids = [activity_id for activity_id, _ in self.bot.refdata.activities()]
+        async with slots:
+            await self.send("start", message_update(telegram_id, "/start"))
+            await self.send("register", message_update(telegram_id, f"Load Cadet {telegram_id}"))
+            for round_ in range(self.rounds):
+                if round_:
+                    await self.send("main_menu", callback_update(telegram_id, MAIN_MENU))
+                await self.send("book", callback_update(telegram_id, BOOK))
+                await self.send("activity", callback_update(
+                    telegram_id, f"activity_{self.rng.choice(activity_ids)}"))
+                await self.send("check_in", callback_update(telegram_id, CHECK_IN))
+                if self.rng.random() < self.roster_ratio:
+                    await self.send("group_roster", message_update(
+                        telegram_id, "/start", chat_id=GROUP_CHAT_ID, chat_type="group"))
+                await self.send("check_out", callback_update(telegram_id, CHECK_OUT))
+
+    async def on_error(self, update, context):
+        self.handler_errors += 1
+
+    async def run(self, cadets, concurrency):
+        self.app.add_error_handler(self.on_error)
+        slots = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        await asyncio.gather(*(self.cadet(500000 + i, slots) for i in range(cadets)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        updates = sum(map(len, self.latencies.values()))
+        steps = {}
+        for step, values in self.latencies.items():
+            values.sort()
+            steps[step] = {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+        pool = self.bot.pool.stats()
+        writes = self.bot.writes.stats()
+        return {
+            "updates": updates,
+            "elapsed_s": round(elapsed, 3),
+            "updates_per_s": round(updates / elapsed, 1),
+            "handler_errors": self.handler_errors,
+            "db_errors": pool["errors"] + writes["failed"],
+            "db_lock_errors": pool["locked_errors"],
+            "steps": steps,
+            "pool": pool,
+            "writes": writes,
+            "db_queue": self.bot.db.stats(),
+        }
+
+
+async def run(args):
+    bot = use_database(make_database(cadets=args.existing, srt_rows=args.history))
+    bot.refdata.reload()
+    builder = (Application.builder().token(FAKE_TOKEN)
+               .request(FakeRequest(args.api_latency / 1000))
+               .get_updates_request(FakeRequest()))
+    app = bot.build_application(builder)
+
+    test = LoadTest(bot, app, args.rounds, args.roster_ratio, args.seed)
+    await app.initialize()
+    elapsed = await test.run(args.cadets, args.concurrency)
+    result = test.report(elapsed)
+    await app.shutdown()
+    return result
+
+
+def print_report(result):
+    print(f"{result['updates']} updates in {result['elapsed_s']}s "
+          f"({result['updates_per_s']}/s), handler errors {result['handler_errors']}, "
+          f"DB errors {result['db_errors']}, DB lock errors {result['db_lock_errors']}")
+    print(f"{'step':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, stats in result["steps"].items():
+        print(f"{step:<14}{stats['count']:>7}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100,
+                        help="cadets sending updates at the same time")
+    parser.add_argument("--rounds", type=int, default=1,
+                        help="book/check-in/check-out cycles per cadet")
+    parser.add_argument("--roster-ratio", type=float, default=0.2,
+                        help="chance a cadet asks for the group roster each round")
+    parser.add_argument("--api-latency", type=float, default=0.0,
+                        help="simulated Bot API latency in ms")
+    parser.add_argument("--existing", type=int, default=0, help="cadets already registered")
+    parser.add_argument("--history", type=int, default=0, help="srt_info rows already stored")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the result to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
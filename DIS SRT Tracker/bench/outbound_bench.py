@@ -0,0 +1,95 @@
+"""
+Peak-hour outbound traffic against a fake Bot API that enforces flood limits.
+
+Every cadet taps through menus faster than Telegram lets the bot edit them,
+while roster messages go to a group. FakeRequest answers 429 when a chat or
+the bot exceeds its per-second limit, fails a share of calls with network
+errors, and jitters latency so calls can overtake each other. The run is
+repeated with and without the OutboundScheduler.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.outbound_bench --cadets 100 --taps 5
+"""
+import argparse
+import asyncio
+import time
+
+from telegram.error import TelegramError
+from telegram.ext import ExtBot
+
+from bench.fake_telegram import FAKE_TOKEN, GROUP_CHAT_ID, FakeRequest
+from outbound import OutboundScheduler
+
+
+async def run(args, scheduler):
+    request = FakeRequest(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                          chat_limit=args.chat_limit, global_limit=args.global_limit,
+                          error_rate=args.error_rate, seed=args.seed)
+    bot = ExtBot(FAKE_TOKEN, request=request, get_updates_request=FakeRequest(),
+                 rate_limiter=scheduler)
+    await bot.initialize()
+    failures = 0
+
+    async def call(coroutine):
+        nonlocal failures
+        try:
+            await coroutine
+        except TelegramError:
+            failures += 1
+
+    async def cadet(chat_id):
+        # Taps arrive faster than the edits can be sent; the last one is what should show
+        await asyncio.gather(*(
+            call(bot.edit_message_text(f"menu {tap}", chat_id=chat_id, message_id=1))
+            for tap in range(args.taps)))
+
+    async def roster():
+        for i in range(args.rosters):
+            await call(bot.send_message(GROUP_CHAT_ID, f"roster {i}"))
+
+    started = time.perf_counter()
+    await asyncio.gather(roster(), *(cadet(200000 + i) for i in range(args.cadets)))
+    elapsed = time.perf_counter() - started
+    await bot.shutdown()
+
+    final = {}
+    for _, endpoint, params in request.sent:
+        if endpoint == "editMessageText":
+            final[params["chat_id"]] = params["text"]
+    stale = sum(1 for text in final.values() if text != f"menu {args.taps - 1}")
+    missing = args.cadets - len(final)
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "api_calls": sum(request.calls.values()),
+        "flood_429": request.failures["flood"],
+        "network_errors": request.failures["network"],
+        "caller_failures": failures,
+        "stale_menus": stale + missing,
+        "scheduler": scheduler.stats() if scheduler else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=100)
+    parser.add_argument("--taps", type=int, default=5, help="menu edits per cadet at once")
+    parser.add_argument("--rosters", type=int, default=10, help="roster messages to the group")
+    parser.add_argument("--latency", type=float, default=20.0, help="ms per API call")
+    parser.add_argument("--jitter", type=float, default=30.0, help="extra random ms per call")
+    parser.add_argument("--chat-limit", type=int, default=3, help="requests per chat per second")
+    parser.add_argument("--global-limit", type=int, default=30, help="requests per second")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for name, scheduler in (("direct", None), ("scheduler", OutboundScheduler(backoff=0.05))):
+        result = asyncio.run(run(args, scheduler))
+        print(f"{name:<10} {result['elapsed_s']:>6}s  {result['api_calls']:>5} API calls  "
+              f"{result['flood_429']:>4} x 429  {result['network_errors']:>3} network errors  "
+              f"{result['caller_failures']:>4} failed calls  {result['stale_menus']:>4} stale menus")
+        if result["scheduler"]:
+            print(f"           {result['scheduler']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Restart check and startup cost for the SQLite persistence.
+
+Cadets book an activity, the bot is stopped, and a new Application on the
+same database must accept "Check In SRT" without a fresh /start. Startup
+time is measured with `--stored` users already in persisted_user_data, to
+show it does not grow with the number of stored users.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.persistence_bench --cadets 200 --stored 20000
+"""
+import argparse
+import asyncio
+import json
+import sqlite3
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import Application
+
+from bench.fake_telegram import FAKE_TOKEN, FakeRequest, callback_update, message_update
+from bench.fixtures import make_database, use_database
+from bench.load_test import BOOK, CHECK_IN
+
+
+def store_users(path, users):
+    """Pretend `users` other people talked to the bot before."""
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT OR IGNORE INTO persisted_user_data (user_id, key, value) VALUES (?, ?, ?)",
+        ((900000 + i, key, json.dumps(value)) for i in range(users)
+         for key, value in (("telegram_id", 900000 + i), ("cadet_id", i), ("chat_type", "private"))))
+    conn.executemany(
+        "INSERT OR IGNORE INTO persisted_conversation (name, key, state) VALUES ('srt', ?, 0)",
+        ((json.dumps([900000 + i, 900000 + i]),) for i in range(users)))
+    conn.commit()
+    conn.close()
+
+
+async def start_app(bot):
+    request = FakeRequest()
+    builder = (Application.builder().token(FAKE_TOKEN).request(request)
+               .get_updates_request(FakeRequest()))
+    app = bot.build_application(builder)
+    started = time.perf_counter()
+    await app.initialize()
+    await app.start()
+    return app, request, time.perf_counter() - started
+
+
+async def send(app, update):
+    await app.process_update(Update.de_json(update, app.bot))
+
+
+async def stop_app(app):
+    await app.stop()
+    await app.shutdown()
+
+
+async def run(args):
+    path = make_database(cadets=args.cadets)
+    bot = use_database(path)
+    bot.identities.invalidate()
+    bot.refdata.reload()
+    store_users(path, args.stored)
+    telegram_ids = [100000 + i for i in range(1, args.cadets + 1)]
+
+    app, _, startup = await start_app(bot)
+    for telegram_id in telegram_ids:
+        await send(app, message_update(telegram_id, "/start"))
+        await send(app, callback_update(telegram_id, BOOK))
+        await send(app, callback_update(telegram_id, "activity_1"))
+    flushed = time.perf_counter()
+    await stop_app(app)
+    flush = time.perf_counter() - flushed
+    first = app.persistence.stats()
+
+    # A new process would start with nothing in memory
+    app, request, restart = await start_app(bot)
+    started = time.perf_counter()
+    for telegram_id in telegram_ids:
+        await send(app, callback_update(telegram_id, CHECK_IN))
+    resumed_in = time.perf_counter() - started
+    await stop_app(app)
+    second = app.persistence.stats()
+    bot.writes.close()
+
+    resumed = sum(1 for _, endpoint, params in request.sent
+                  if endpoint == "editMessageText" and params.get("text") == "You have commenced your SRT.")
+    print(f"startup with {args.stored} stored users: {startup * 1000:.1f} ms, "
+          f"restart: {restart * 1000:.1f} ms")
+    print(f"first run: flushed in {flush * 1000:.1f} ms, {first}")
+    print(f"after restart: {resumed}/{args.cadets} cadets checked in without /start "
+          f"({resumed_in / args.cadets * 1000:.2f} ms each), {second}")
+    return resumed == args.cadets and second["keys_written"] == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=200)
+    parser.add_argument("--stored", type=int, default=20000)
+    args = parser.parse_args()
+
+    if not asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Assert that every hot query is answered from an index rather than a full scan.
+
+Builds a migrated database with history, runs EXPLAIN QUERY PLAN on each
+query and exits non-zero if any of them scans its main table, or if a query
+registered by the repository modules does not compile against the schema.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.query_plan_check
+"""
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+from bench.fixtures import make_database
+from db import cadet, cadet_group, exporter, funcs, group, persistence, rollups, srt_info
+from db.migrations import explain, migrate, uses_index
+from db.timestamps import day_range
+
+# Group chats added to the fixture, so the plans are the ones a bot in many groups gets
+GROUPS = 50
+NOW = "2000-01-01 18:00:00"
+NOW_TS = 946749600
+
+
+def registered(name):
+    return funcs.QUERIES[name]
+
+
+# name -> (table that must not be scanned, query, params). The queries are
+# the statements the bot runs, taken from the query registry and the modules
+# that build them, so a change to one of them is checked here.
+HOT_QUERIES = {
+    "cadet by telegram_id": ("cadet", registered(cadet.BY_TELEGRAM_ID), (100001,)),
+    "group by chat id": ("group", registered(group.BY_TELE_ID), (-100,)),
+    "set live roster message": ("group", registered(group.SET_LIVE_MESSAGE), (1, -100)),
+    "cadet in group": ("cadet_group", registered(cadet_group.MEMBERSHIP), (1, 1)),
+    "current status": ("srt_current", registered(srt_info.STATUS), (1,)),
+    "cadet dashboard": ("srt_current", registered(srt_info.DASHBOARD), (*day_range(), 100001)),
+    "roster": ("srt_current", registered(srt_info.ROSTER), (3,)),
+    "group roster": ("cadet_group", registered(srt_info.GROUP_ROSTER), (-100, 3)),
+    "check-in history": ("srt_info", registered(srt_info.CHECK_IN[0]), (NOW, NOW_TS, 2, 1)),
+    "check-in current": ("srt_current", registered(srt_info.CHECK_IN[1]), (NOW, NOW_TS, 2, 1)),
+    "check-out history": ("srt_info", registered(srt_info.CHECK_OUT[0]), (NOW, NOW_TS, 3, 1)),
+    "check-out current": ("srt_current", registered(srt_info.CHECK_OUT[1]), (NOW, NOW_TS, 3, 1)),
+    "check-out rollup": ("srt_current", registered(rollups.ADD_CHECK_OUT), (NOW, 1)),
+    "close day rollup": ("srt_current", registered(rollups.ADD_ALL_CHECK_OUTS), (NOW, 2)),
+    "close day history": ("srt_info", registered(srt_info.CLOSE_HISTORY), (NOW, NOW_TS, 3, 2)),
+    "close day current": ("srt_current", registered(srt_info.CLOSE_CURRENT), (NOW, NOW_TS, 3, 2)),
+    "expire unstarted bookings": ("srt_current", registered(srt_info.EXPIRE_PENDING), (1, day_range()[0])),
+    "user_data load": ("persisted_user_data", registered(persistence.LOAD_USER), (100001,)),
+    "user_data key delete": ("persisted_user_data", registered(persistence.DELETE_USER_KEY), (100001, "k")),
+    "history export by date": ("srt_info", *exporter.export_query(since=date.today() - timedelta(days=2))),
+}
+
+
+def check(conn, queries=HOT_QUERIES):
+    failures = []
+    for name, (table, query, params) in queries.items():
+        plan = explain(conn, query, params)
+        ok = uses_index(plan, table)
+        print(f"{'ok  ' if ok else 'SCAN'} {name}: {' / '.join(plan)}")
+        if not ok:
+            failures.append(name)
+    return failures
+
+
+def main():
+    conn = sqlite3.connect(make_database(cadets=200, srt_rows=5000))
+    print("schema version", migrate(conn))
+    # With only the seeded groups, scanning 'group' is the cheapest plan
+    conn.executemany("INSERT INTO 'group' (tele_id, name) VALUES (?, ?)",
+                     ((-1000 - i, f"Flight {i}") for i in range(GROUPS)))
+    conn.commit()
+    conn.execute("ANALYZE")
+    failures = check(conn)
+    errors = funcs.check(conn)
+    conn.close()
+    for name, error in errors.items():
+        print(f"FAIL {name}: {error}")
+    print(f"{len(funcs.QUERIES) - len(errors)}/{len(funcs.QUERIES)} registered queries compile")
+    if failures:
+        sys.exit(f"{len(failures)} hot queries scan without an index: {', '.join(failures)}")
+    if errors:
+        sys.exit(f"{len(errors)} registered queries do not compile: {', '.join(errors)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Statement cache and batch variants of the repository layer (db/funcs.py).
+
+Times the hot read helpers with each pooled connection's statement cache
+turned off (cached_statements=0, every call parses its SQL again) and at the
+pool default, then a day's check-ins applied one record_check_in at a time
+against one record_check_ins batch in the same transaction.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.repository_bench --cadets 2000
+"""
+import argparse
+import time
+from datetime import datetime
+
+from bench.fixtures import make_database, use_database
+from db import funcs
+from db.srt_info import record_check_in, record_check_ins
+
+
+def per_call(run, calls):
+    started = time.perf_counter()
+    for i in range(calls):
+        run(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def read_helpers(bot, cadets, calls):
+    telegram_id = lambda i: 100001 + i % cadets
+    return {
+        "load_cadet": per_call(lambda i: bot.load_cadet(telegram_id(i)), calls),
+        "get_cadet_dashboard": per_call(lambda i: bot.get_cadet_dashboard(telegram_id(i)), calls),
+        "check_status_exists": per_call(lambda i: bot.check_status_exists(1 + i % cadets), calls),
+        "get_group_id": per_call(lambda i: bot.get_group_id(-1000), calls),
+    }
+
+
+def check_ins(bot, cadets, batch):
+    stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [(stamp, 2, cadet_id) for cadet_id in range(1, cadets + 1)]
+    with bot.pool.connection() as conn:
+        started = time.perf_counter()
+        if batch:
+            record_check_ins(conn, rows)
+        else:
+            for row in rows:
+                record_check_in(conn, *row)
+        elapsed = time.perf_counter() - started
+        conn.rollback()
+    return elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=100000)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    path = make_database(cadets=args.cadets, srt_rows=args.history)
+    bot = use_database(path)
+    with bot.pool.connection() as conn:
+        errors = funcs.check(conn)
+    print(f"{len(funcs.QUERIES) - len(errors)}/{len(funcs.QUERIES)} registered queries compile"
+          + (f", failed: {errors}" if errors else ""))
+
+    results = {}
+    for cached_statements in (0, 256):
+        bot = use_database(path, cached_statements=cached_statements)
+        bot.refdata.reload()
+        read_helpers(bot, args.cadets, args.calls // 10)  # warm the page cache
+        results[cached_statements] = read_helpers(bot, args.cadets, args.calls)
+
+    print(f"{'helper':<24}{'uncached us':>12}{'cached us':>11}{'speedup':>9}")
+    for name, uncached in results[0].items():
+        cached = results[256][name]
+        print(f"{name:<24}{uncached:>12.1f}{cached:>11.1f}{uncached / cached:>8.2f}x")
+
+    single, batch = check_ins(bot, args.cadets, False), check_ins(bot, args.cadets, True)
+    print(f"{args.cadets} check-ins in one transaction: one at a time {single:.1f} ms, "
+          f"record_check_ins {batch:.1f} ms ({single / batch:.2f}x)")
+    bot.pool.close()
+
+
+if __name__ == "__main__":
+    main()
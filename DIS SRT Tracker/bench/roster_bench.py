@@ -0,0 +1,63 @@
+"""
+Compare the single-query group roster against the old four-query path.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.roster_bench --rows 2000 20000
+"""
+import argparse
+import sqlite3
+import timeit
+
+from bench.fixtures import make_database, use_database
+
+# The per-activity query start() used to run once for each of the four activities
+LEGACY_QUERY = """
+SELECT
+    cadet.name AS cadet_name,
+    STRFTIME('%H%M', srt_info.datetime_in)
+FROM
+    srt_info
+JOIN
+    cadet ON srt_info.cadet_id = cadet.cadet_id
+JOIN
+    activity ON srt_info.activity_id = activity.activity_id
+JOIN
+    status ON srt_info.status_id = status.status_id
+WHERE
+    activity.activity_id = ? AND status.status_id != 3
+"""
+
+
+def legacy_roster(path):
+    rows = []
+    for activity_id in (1, 2, 3, 4):
+        conn = sqlite3.connect(path)
+        rows.append(conn.execute(LEGACY_QUERY, (activity_id,)).fetchall())
+        conn.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[2000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        path = make_database(cadets=500, srt_rows=rows)
+        bot = use_database(path)
+
+        # The old path reads every open row in the srt_info history, the new one
+        # only each cadet's current booking, so the row counts differ
+        legacy = sum(map(len, legacy_roster(path)))
+        current = sum(len(cadets) for _, cadets in bot.get_roster())
+
+        old = timeit.timeit(lambda: legacy_roster(path), number=args.repeat) / args.repeat
+        new = timeit.timeit(bot.get_roster, number=args.repeat) / args.repeat
+        print(f"{rows:>7} srt_info rows | four queries {old * 1000:8.2f} ms"
+              f" | get_roster {new * 1000:8.2f} ms | {old / new:5.1f}x"
+              f" | rows {legacy} -> {current}")
+
+
+if __name__ == "__main__":
+    main()
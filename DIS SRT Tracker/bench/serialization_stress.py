@@ -0,0 +1,140 @@
+"""
+Stress test: every cadet fires bursts of button presses at the same time,
+including double taps on Check In and Check Out.
+
+Updates go through the Application's update queue and update processor, so
+this exercises concurrent processing exactly as polling or the webhook
+would. Afterwards every cadet must have exactly `rounds` completed bookings:
+fewer means a check-in or check-out was lost, more means one was duplicated.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.serialization_stress --cadets 300 --rounds 3
+    python -m bench.serialization_stress --processor simple   # PTB's unserialized processor
+"""
+import argparse
+import asyncio
+import random
+import sqlite3
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import Application, SimpleUpdateProcessor
+
+from bench.fake_telegram import FAKE_TOKEN, FakeRequest, callback_update, message_update
+from bench.fixtures import make_database, use_database
+from bench.load_test import BOOK, CHECK_IN, CHECK_OUT, MAIN_MENU
+from update_processor import CadetUpdateProcessor
+
+
+def burst(telegram_id, rounds, activity_ids, rng):
+    updates = [message_update(telegram_id, "/start")]
+    for _ in range(rounds):
+        updates += [
+            callback_update(telegram_id, BOOK),
+            callback_update(telegram_id, f"activity_{rng.choice(activity_ids)}"),
+            callback_update(telegram_id, CHECK_IN),
+            callback_update(telegram_id, CHECK_IN),
+            callback_update(telegram_id, CHECK_OUT),
+            callback_update(telegram_id, CHECK_OUT),
+            callback_update(telegram_id, MAIN_MENU),
+        ]
+    return updates
+
+
+def interleave(bursts, rng):
+    """Merge the bursts at random while keeping each cadet's own order."""
+    merged = []
+    queues = [list(reversed(b)) for b in bursts]
+    while queues:
+        queue = rng.choice(queues)
+        merged.append(queue.pop())
+        if not queue:
+            queues.remove(queue)
+    return merged
+
+
+async def wait_until_idle(app, processor):
+    idle_checks = 0
+    while idle_checks < 5:
+        await asyncio.sleep(0.02)
+        busy = app.update_queue.qsize() or processor.current_concurrent_updates
+        idle_checks = 0 if busy else idle_checks + 1
+
+
+def verify(path, cadets, rounds):
+    """Return (lost, duplicated, cadets with a wrong count) from the database."""
+    conn = sqlite3.connect(path)
+    completed = dict(conn.execute(
+        """
+        SELECT cadet_id, count(*)
+        FROM srt_info
+        WHERE status_id = 3 AND datetime_in IS NOT NULL AND datetime_out IS NOT NULL
+        GROUP BY cadet_id
+        """))
+    rollup = dict(conn.execute(
+        "SELECT cadet_id, sum(completed) FROM srt_daily_rollup GROUP BY cadet_id"))
+    conn.close()
+
+    lost = duplicated = wrong = 0
+    for cadet_id in range(1, cadets + 1):
+        count = completed.get(cadet_id, 0)
+        lost += max(rounds - count, 0)
+        duplicated += max(count - rounds, 0)
+        wrong += count != rounds or rollup.get(cadet_id, 0) != rounds
+    return lost, duplicated, wrong
+
+
+async def run(args):
+    path = make_database(cadets=args.cadets)
+    bot = use_database(path)
+    bot.identities.invalidate()
+    bot.refdata.reload()
+    processor = (CadetUpdateProcessor(args.concurrency) if args.processor == "cadet"
+                 else SimpleUpdateProcessor(args.concurrency))
+    builder = (Application.builder().token(FAKE_TOKEN).request(FakeRequest())
+               .get_updates_request(FakeRequest()).concurrent_updates(processor))
+    app = bot.build_application(builder)
+
+    rng = random.Random(args.seed)
+    activity_ids = [activity_id for activity_id, _ in bot.refdata.activities()]
+    updates = interleave([
+        burst(100000 + i, args.rounds, activity_ids, rng) for i in range(1, args.cadets + 1)
+    ], rng)
+
+    await app.initialize()
+    await app.start()
+    started = time.perf_counter()
+    for update in updates:
+        app.update_queue.put_nowait(Update.de_json(update, app.bot))
+    await wait_until_idle(app, processor)
+    elapsed = time.perf_counter() - started
+    await app.stop()
+    await app.shutdown()
+    bot.writes.close()
+
+    lost, duplicated, wrong = verify(path, args.cadets, args.rounds)
+    print(f"{args.processor} processor: {len(updates)} updates in {elapsed:.2f}s "
+          f"({len(updates) / elapsed:.0f}/s)")
+    print(f"expected {args.cadets * args.rounds} completed bookings: "
+          f"{lost} lost, {duplicated} duplicated, {wrong} cadets wrong")
+    if isinstance(processor, CadetUpdateProcessor):
+        print(f"processor stats: {processor.stats()}")
+    return lost + duplicated + wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--processor", choices=("cadet", "simple"), default="cadet")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if asyncio.run(run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
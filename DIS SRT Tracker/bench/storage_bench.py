@@ -0,0 +1,107 @@
+"""
+Rollback journal against the WAL storage profile under mixed load.
+
+Writer threads check cadets in and out through the write queue while reader
+threads build the roster and cadet dashboards, for `--seconds` per profile.
+Reports commits per second, reader latency and lock errors, then shows that
+storage maintenance lets the next commit shrink the WAL file back to
+journal_size_limit.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.storage_bench --seconds 5
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+
+from bench.fixtures import make_database, use_database
+from bench.load_test import percentile
+from db import storage
+
+ROLLBACK_JOURNAL = {"journal_mode": "delete", "synchronous": "full", "temp_store": "default",
+                    "mmap_size": 0, "cache_size": -2000, "busy_timeout": 5000,
+                    "journal_size_limit": -1}
+
+
+def run(args, name, profile):
+    path = make_database(cadets=args.cadets, srt_rows=args.history)
+    bot = use_database(path, pragmas=storage.pragmas(profile))
+    bot.refdata.reload()
+    bot.identities.invalidate()
+    with bot.pool.connection() as conn:
+        mismatches = storage.verify(conn, profile)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for cadet_id in range(1, args.cadets + 1):
+        bot.writes.run(bot.record_booking, cadet_id, 1 + cadet_id % 4, None, None, now, 1)
+
+    stop = threading.Event()
+    commits = [0] * args.writers
+    reads = []
+    errors = []
+
+    def writer(index):
+        cadet_id = index
+        while not stop.is_set():
+            stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            try:
+                bot.writes.run(bot.record_check_in, stamp, 2, 1 + cadet_id % args.cadets)
+                commits[index] += 1
+            except Exception as e:
+                errors.append(e)
+            cadet_id += args.writers
+
+    def reader(index):
+        telegram_id = 100001 + index
+        while not stop.is_set():
+            started = time.perf_counter()
+            bot.get_roster()
+            bot.get_cadet_dashboard(telegram_id)
+            reads.append(time.perf_counter() - started)
+            telegram_id = 100001 + (telegram_id - 100000) % args.cadets
+
+    threads = ([threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+               + [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)])
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    wal = path + "-wal"
+    wal_before = os.path.getsize(wal) if os.path.exists(wal) else 0
+    with bot.pool.connection() as conn:
+        maintenance = storage.maintain(conn)
+    # The next commit restarts the checkpointed WAL and truncates it to journal_size_limit
+    bot.writes.run(bot.record_check_in, now, 2, 1)
+    wal_after = os.path.getsize(wal) if os.path.exists(wal) else 0
+    pool = bot.pool.stats()
+    bot.pool.close()
+
+    reads.sort()
+    print(f"{name:<17} {sum(commits) / args.seconds:>8.0f} write ops/s  "
+          f"reads p50 {percentile(reads, 50) * 1000:6.2f} ms  p95 {percentile(reads, 95) * 1000:6.2f} ms  "
+          f"max {reads[-1] * 1000:7.2f} ms  {len(errors) + pool['locked_errors']} lock errors")
+    print(f"{'':<17} not applied: {mismatches or 'none'}; WAL {wal_before / 1024:.0f} KiB -> "
+          f"{wal_after / 1024:.0f} KiB after maintenance {maintenance}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=100000)
+    parser.add_argument("--journal-size-limit", type=int, default=4 * 2 ** 20)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    run(args, "rollback journal", ROLLBACK_JOURNAL)
+    run(args, "storage profile",
+        dict(storage.DEFAULT_PROFILE, journal_size_limit=args.journal_size_limit))
+
+
+if __name__ == "__main__":
+    main()
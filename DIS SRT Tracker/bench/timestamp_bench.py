@@ -0,0 +1,113 @@
+"""
+TEXT timestamps against the epoch columns from migration 6, on a large history.
+
+Each pair runs the query the bot used before (date() and STRFTIME() on the
+TEXT columns) and the one it uses now (half-open ranges on created_ts,
+times formatted in Python for the rows shown), and prints both timings and
+query plans. The date(created_on) index that migration 8 dropped is put back
+on the fixture, so the TEXT queries run with the index they had.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.timestamp_bench --history 500000
+"""
+import argparse
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from bench.fixtures import make_database, use_database
+from db.migrations import explain
+from db.timestamps import clock, day_range
+
+
+def timed(run, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def cases(conn, telegram_ids):
+    today = date.today()
+    week_ago = today - timedelta(days=6)
+    ids = iter(telegram_ids * 1000)
+
+    def dashboard_old():
+        for _ in range(100):
+            conn.execute("""
+                SELECT STRFTIME('%H%M', srt_current.datetime_in),
+                       STRFTIME('%H%M', srt_current.datetime_out),
+                       date(srt_current.created_on) = date('now')
+                FROM cadet LEFT JOIN srt_current ON srt_current.cadet_id = cadet.cadet_id
+                WHERE cadet.telegram_id = ?
+            """, (next(ids),)).fetchone()
+
+    def dashboard_new():
+        for _ in range(100):
+            in_ts, out_ts, today_ = conn.execute("""
+                SELECT srt_current.in_ts, srt_current.out_ts,
+                       srt_current.created_ts >= ? AND srt_current.created_ts < ?
+                FROM cadet LEFT JOIN srt_current ON srt_current.cadet_id = cadet.cadet_id
+                WHERE cadet.telegram_id = ?
+            """, (*day_range(), next(ids))).fetchone()
+            clock(in_ts), clock(out_ts)
+
+    def roster_old():
+        conn.execute("""
+            SELECT cadet_id, STRFTIME('%H%M', datetime_in) FROM srt_current WHERE status_id != 3
+        """).fetchall()
+
+    def roster_new():
+        [(cadet_id, clock(in_ts)) for cadet_id, in_ts in conn.execute(
+            "SELECT cadet_id, in_ts FROM srt_current WHERE status_id != 3")]
+
+    week_old = ("SELECT count(*), sum(datetime_out IS NOT NULL) FROM srt_info "
+                "WHERE created_on >= ? AND created_on < ?",
+                (week_ago.isoformat(), (today + timedelta(days=1)).isoformat()))
+    week_new = ("SELECT count(*), sum(out_ts IS NOT NULL) FROM srt_info "
+                "WHERE created_ts >= ? AND created_ts < ?", day_range(week_ago, today))
+    today_old = ("SELECT count(*) FROM srt_info WHERE date(created_on) = date('now')", ())
+    today_new = ("SELECT count(*) FROM srt_info WHERE created_ts >= ? AND created_ts < ?",
+                 day_range())
+
+    return [
+        ("100 dashboards", dashboard_old, dashboard_new, None),
+        ("roster formatting", roster_old, roster_new, None),
+        ("last 7 days of history", lambda: conn.execute(*week_old).fetchall(),
+         lambda: conn.execute(*week_new).fetchall(), (week_old, week_new)),
+        ("bookings made today", lambda: conn.execute(*today_old).fetchall(),
+         lambda: conn.execute(*today_new).fetchall(), (today_old, today_new)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=5000)
+    parser.add_argument("--history", type=int, default=500000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    path = make_database(cadets=args.cadets, srt_rows=args.history, days=args.days)
+    started = time.perf_counter()
+    use_database(path).pool.close()
+    print(f"migrated {args.history} rows in {time.perf_counter() - started:.2f}s")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE INDEX idx_srt_info_created_date ON srt_info (date(created_on))")
+    conn.execute("ANALYZE")
+    telegram_ids = [100000 + i for i in range(1, args.cadets + 1)]
+
+    print(f"{'query':<24}{'TEXT ms':>10}{'epoch ms':>10}{'speedup':>9}")
+    for name, old, new, plans in cases(conn, telegram_ids):
+        old_ms, new_ms = timed(old, args.repeat), timed(new, args.repeat)
+        print(f"{name:<24}{old_ms:>10.3f}{new_ms:>10.3f}{old_ms / new_ms:>8.1f}x")
+        if plans:
+            for label, (query, params) in zip(("TEXT", "epoch"), plans):
+                print(f"    {label:<6} {' / '.join(explain(conn, query, params))}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
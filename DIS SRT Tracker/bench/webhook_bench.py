@@ -0,0 +1,250 @@
+"""
+End-to-end latency of webhook delivery versus long polling.
+
+Replays recorded Update JSON through the real Application: once by posting
+each update to the local webhook listener, once by handing it out from a
+fake getUpdates. Latency is measured from the moment an update reaches
+Telegram to the moment the bot sends its reply. Every cadet waits for the
+reply before sending the next update, like a person tapping buttons.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.webhook_bench --cadets 200 --rtt 60
+    python -m bench.webhook_bench --save updates.jsonl    # record the updates used
+    python -m bench.webhook_bench --updates updates.jsonl # replay a recording
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict
+
+from telegram.ext import Application
+
+from bench.fake_telegram import FAKE_TOKEN, FakeRequest, callback_update, message_update
+from bench.fixtures import make_database, use_database
+from bench.load_test import BOOK, CHECK_IN, CHECK_OUT, percentile
+from update_processor import CadetUpdateProcessor
+
+SECRET = "offline-bench"
+
+
+def record(cadets):
+    """Updates for each cadet to register, book, check in and check out."""
+    updates = []
+    for telegram_id in range(700000, 700000 + cadets):
+        updates += [
+            message_update(telegram_id, "/start"),
+            message_update(telegram_id, f"Bench Cadet {telegram_id}"),
+            callback_update(telegram_id, BOOK),
+            callback_update(telegram_id, "activity_1"),
+            callback_update(telegram_id, CHECK_IN),
+            callback_update(telegram_id, CHECK_OUT),
+        ]
+    return updates
+
+
+def by_sender(updates):
+    cadets = defaultdict(list)
+    for update in updates:
+        sender = (update.get("message") or update.get("callback_query"))["from"]["id"]
+        cadets[sender].append(update)
+    return cadets
+
+
+class ReplyWatcher(FakeRequest):
+    """FakeRequest that tells a waiting cadet when the bot replied in their chat."""
+
+    def __init__(self):
+        super().__init__()
+        self.waiters = {}
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        response = await super().do_request(url, method, request_data, **kwargs)
+        if url.endswith(("/sendMessage", "/editMessageText")):
+            waiter = self.waiters.pop(request_data.parameters.get("chat_id"), None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(time.perf_counter())
+        return response
+
+
+class PollingSource(FakeRequest):
+    """Answer getUpdates like Telegram does: long poll, with network delay each way."""
+
+    def __init__(self, one_way):
+        super().__init__()
+        self.one_way = one_way
+        self.pending = []
+        self.arrived = asyncio.Event()
+
+    def push(self, update):
+        self.pending.append(update)
+        self.arrived.set()
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if not url.endswith("/getUpdates"):
+            return await super().do_request(url, method, request_data, **kwargs)
+        params = request_data.parameters if request_data else {}
+        await asyncio.sleep(self.one_way)
+        offset = params.get("offset", 0)
+        self.pending = [update for update in self.pending if update["update_id"] >= offset]
+        if not self.pending:
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), params.get("timeout", 0))
+            except asyncio.TimeoutError:
+                pass
+        batch = self.pending[:100]
+        await asyncio.sleep(self.one_way)
+        return 200, json.dumps({"ok": True, "result": batch}).encode()
+
+
+class WebhookClient:
+    """
+    Post updates over a few keep-alive HTTP/1.1 connections, the way Telegram
+    delivers to a webhook with `max_connections` set. Kept minimal so the
+    client itself does not dominate the measurement.
+    """
+
+    def __init__(self, port, path, connections):
+        self.port = port
+        self.path = path
+        self.connections = connections
+        self._opened = 0
+        self._idle = asyncio.Queue()
+
+    async def _checkout(self):
+        if self._idle.empty() and self._opened < self.connections:
+            self._opened += 1
+            return await asyncio.open_connection("127.0.0.1", self.port)
+        return await self._idle.get()
+
+    async def post(self, update):
+        body = json.dumps(update).encode()
+        reader, writer = await self._checkout()
+        writer.write(
+            f"POST /{self.path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"X-Telegram-Bot-Api-Secret-Token: {SECRET}\r\n\r\n".encode() + body)
+        status = await reader.readline()
+        length = 0
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        await reader.readexactly(length)
+        self._idle.put_nowait((reader, writer))
+        if b" 200 " not in status:
+            raise RuntimeError(f"Webhook answered {status.decode().strip()}")
+
+    async def close(self):
+        while not self._idle.empty():
+            _, writer = self._idle.get_nowait()
+            writer.close()
+
+
+async def replay(updates, watcher, deliver, think):
+    # Telegram numbers updates in arrival order, so renumber on delivery
+    update_ids = itertools.count(1)
+    latencies = []
+    loop = asyncio.get_running_loop()
+
+    async def cadet(telegram_id, sequence):
+        for update in sequence:
+            waiter = watcher.waiters[telegram_id] = loop.create_future()
+            started = time.perf_counter()
+            await deliver(dict(update, update_id=next(update_ids)))
+            latencies.append(await asyncio.wait_for(waiter, 30) - started)
+            await asyncio.sleep(think)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(cadet(tid, seq) for tid, seq in by_sender(updates).items()))
+    return latencies, time.perf_counter() - started
+
+
+async def run_mode(mode, updates, args):
+    bot = use_database(make_database(cadets=0))
+    bot.identities.invalidate()
+    bot.refdata.reload()
+    watcher = ReplyWatcher()
+    one_way = args.rtt / 2000
+    source = PollingSource(one_way) if mode == "polling" else FakeRequest()
+    builder = (Application.builder().token(FAKE_TOKEN).request(watcher)
+               .get_updates_request(source)
+               .concurrent_updates(CadetUpdateProcessor(args.concurrency)))
+    app = bot.build_application(builder)
+    await app.initialize()
+
+    if mode == "webhook":
+        await app.updater.start_webhook(
+            listen="127.0.0.1", port=args.port, url_path="telegram",
+            secret_token=SECRET, max_connections=args.concurrency)
+        client = WebhookClient(args.port, "telegram", args.concurrency)
+
+        async def deliver(update):
+            await asyncio.sleep(one_way)
+            await client.post(update)
+    else:
+        await app.updater.start_polling(poll_interval=0, timeout=10)
+        client = None
+
+        async def deliver(update):
+            source.push(update)
+
+    await app.start()
+    try:
+        latencies, elapsed = await replay(updates, watcher, deliver, args.think / 1000)
+    finally:
+        await app.updater.stop()
+        await app.stop()
+        await app.shutdown()
+        if client is not None:
+            await client.close()
+        bot.writes.close()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "updates": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=200)
+    parser.add_argument("--rtt", type=float, default=60.0,
+                        help="simulated round trip between the bot and Telegram in ms")
+    parser.add_argument("--think", type=float, default=0.0,
+                        help="ms a cadet waits after a reply before tapping again")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--updates", help="JSONL file of recorded updates to replay")
+    parser.add_argument("--save", help="write the updates used to this JSONL file")
+    args = parser.parse_args()
+
+    if args.updates:
+        with open(args.updates) as f:
+            updates = [json.loads(line) for line in f if line.strip()]
+    else:
+        updates = record(args.cadets)
+    if args.save:
+        with open(args.save, "w") as f:
+            f.writelines(json.dumps(update) + "\n" for update in updates)
+
+    print(f"{'mode':<10}{'updates':>9}{'per s':>9}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>10}")
+    for mode in ("webhook", "polling"):
+        result = asyncio.run(run_mode(mode, updates, args))
+        print(f"{mode:<10}{result['updates']:>9}{result['updates_per_s']:>9}"
+              f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+              f"{result['max_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Stress test: hundreds of cadets press "Check In SRT" at the same moment.
+
+Compares one connection and commit per check-in (the old helpers) against
+the group-commit WriteQueue, and checks every check-in landed exactly once.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m bench.write_queue_bench --cadets 500
+"""
+import argparse
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.fixtures import make_database, use_database
+
+
+def commit_each(path, datetime_in, cadet_id):
+    # What srt_check_in did before the write queue: own connection, own commit
+    conn = sqlite3.connect(path, timeout=5)
+    try:
+        conn.execute("PRAGMA synchronous = FULL")
+        conn.execute(
+            "UPDATE srt_info SET datetime_in = ?, status_id = 2 WHERE cadet_id = ?",
+            (datetime_in, cadet_id))
+        conn.commit()
+        return None
+    except sqlite3.Error as e:
+        return e
+    finally:
+        conn.close()
+
+
+async def run_commit_each(path, cadets, threads):
+    loop = asyncio.get_running_loop()
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    with ThreadPoolExecutor(threads) as executor:
+        errors = await asyncio.gather(*(
+            loop.run_in_executor(executor, commit_each, path, now, cadet_id)
+            for cadet_id in range(1, cadets + 1)))
+    return [e for e in errors if e is not None]
+
+
+async def run_write_queue(bot, cadets):
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    ok = await asyncio.gather(*(
+        bot.queue_write(bot.record_check_in, now, 2, cadet_id)
+        for cadet_id in range(1, cadets + 1)))
+    return [result for result in ok if not result]
+
+
+def checked_in(path, cadets):
+    conn = sqlite3.connect(path)
+    count = conn.execute(
+        "SELECT count(DISTINCT cadet_id) FROM srt_info WHERE status_id = 2 AND cadet_id <= ?",
+        (cadets,)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def fresh_database(cadets):
+    # One pending booking per cadet so each check-in updates exactly one row
+    path = make_database(cadets=cadets, srt_rows=0)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO srt_info (cadet_id, activity_id, created_on, status_id) VALUES (?, 1, datetime('now'), 1)",
+        ((cadet_id,) for cadet_id in range(1, cadets + 1)))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cadets", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    path = fresh_database(args.cadets)
+    started = time.perf_counter()
+    errors = asyncio.run(run_commit_each(path, args.cadets, args.threads))
+    elapsed = time.perf_counter() - started
+    print(f"commit per check-in: {args.cadets / elapsed:8.0f} check-ins/s, "
+          f"{len(errors)} errors, {checked_in(path, args.cadets)}/{args.cadets} checked in")
+
+    path = fresh_database(args.cadets)
+    bot = use_database(path)
+    bot.pool.pragmas += ("PRAGMA synchronous = FULL",)
+    started = time.perf_counter()
+    failures = asyncio.run(run_write_queue(bot, args.cadets))
+    elapsed = time.perf_counter() - started
+    bot.writes.close()
+    print(f"write queue:         {args.cadets / elapsed:8.0f} check-ins/s, "
+          f"{len(failures)} errors, {checked_in(path, args.cadets)}/{args.cadets} checked in, "
+          f"{bot.writes.stats()}")
+
+
+if __name__ == "__main__":
+    main()
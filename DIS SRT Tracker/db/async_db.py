@@ -0,0 +1,72 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+class DatabaseBusy(Exception):
+    """Raised when the pending-call queue stays full past the wait timeout."""
+
+
+class AsyncDatabase:
+    """
+    Run the blocking sqlite helpers on worker threads so handlers can await them.
+
+    At most `max_pending` calls may be queued or running at once. Further
+    callers wait for a free slot (backpressure), and give up with
+    DatabaseBusy after `wait_timeout` seconds if one is set.
+
+    Args:
+        max_workers (int): Worker threads, keep this at or below the pool size.
+        max_pending (int): Bound on calls queued or in flight.
+        wait_timeout (float | None): Seconds to wait for a slot, None waits forever.
+    """
+
+    def __init__(self, max_workers=4, max_pending=64, wait_timeout=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="srt-db")
+        self._slots = asyncio.Semaphore(max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {"calls": 0, "waits": 0, "rejected": 0, "peak_in_flight": 0}
+
+    async def _take_slot(self):
+        if self._slots.locked():
+            with self._lock:
+                self._stats["waits"] += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise DatabaseBusy(
+                f"{self.max_pending} database calls already pending")
+
+    async def run(self, func, *args, **kwargs):
+        """Call `func(*args, **kwargs)` on a DB worker thread and return its result."""
+        await self._take_slot()
+        with self._lock:
+            self._stats["calls"] += 1
+            self._in_flight += 1
+            self._stats["peak_in_flight"] = max(
+                self._stats["peak_in_flight"], self._in_flight)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def stats(self):
+        """Return a snapshot of queue counters."""
+        with self._lock:
+            return dict(self._stats, in_flight=self._in_flight,
+                        max_pending=self.max_pending)
+
+    def close(self):
+        """Wait for running calls to finish and stop the worker threads."""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,19 @@
+"""Cadet rows: lookups by Telegram ID and registration."""
+from db.funcs import execute, fetch_one, query
+
+BY_TELEGRAM_ID = query("cadet.by_telegram_id", """
+    SELECT cadet_id, name FROM cadet WHERE telegram_id = ?
+""")
+INSERT = query("cadet.insert", """
+    INSERT INTO cadet (telegram_id, telegram_username, name) VALUES (?, ?, ?)
+""")
+
+
+def find(conn, telegram_id):
+    """(cadet_id, name) for a Telegram ID, or None if the cadet is not registered."""
+    return fetch_one(conn, BY_TELEGRAM_ID, (telegram_id, ))
+
+
+def insert(conn, telegram_id, username, name):
+    """Register a cadet and return the new cadet_id."""
+    return execute(conn, INSERT, (telegram_id, username, name)).lastrowid
@@ -0,0 +1,21 @@
+"""Group memberships: which cadets belong to which group chats."""
+from db.funcs import execute, fetch_all, query
+
+# group_id seeded by db/populate_tables.py for cadets not in any group chat
+NO_GROUP_ID = 1
+
+MEMBERSHIP = query("cadet_group.membership", """
+    SELECT * FROM cadet_group WHERE cadet_id = ? AND group_id = ?
+""")
+INSERT = query("cadet_group.insert", """
+    INSERT INTO cadet_group (cadet_id, group_id) VALUES (?, ?)
+""")
+
+
+def find(conn, cadet_id, group_id=NO_GROUP_ID):
+    """The cadet_group rows joining `cadet_id` to `group_id`; empty if not a member."""
+    return fetch_all(conn, MEMBERSHIP, (cadet_id, group_id))
+
+
+def add(conn, cadet_id, group_id=NO_GROUP_ID):
+    execute(conn, INSERT, (cadet_id, group_id))
@@ -0,0 +1,143 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Applied once to every connection the pool opens
+DEFAULT_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+)
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection frees up within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of long-lived SQLite connections.
+
+    A thread keeps the same connection for nested checkouts, so helpers that
+    call other helpers do not take a second connection. Idle connections are
+    handed back to the next thread that asks instead of being closed.
+
+    Args:
+        database (str): Path to the SQLite database file.
+        max_connections (int): Upper bound on open connections.
+        timeout (float): Seconds to wait for a free connection.
+        pragmas (tuple): Statements run once when a connection is opened.
+        factory (type): sqlite3.Connection subclass to open, e.g. one that times statements.
+        cached_statements (int): Prepared statements each connection keeps for reuse.
+    """
+
+    def __init__(self, database, max_connections=8, timeout=10.0, pragmas=DEFAULT_PRAGMAS,
+                 factory=sqlite3.Connection, cached_statements=256):
+        self.database = database
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self.factory = factory
+        self.cached_statements = cached_statements
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._local = threading.local()
+        self._open = 0
+        self._stats = {
+            "checkouts": 0,
+            "reused": 0,
+            "waits": 0,
+            "created": 0,
+            "errors": 0,
+            "locked_errors": 0,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False, factory=self.factory,
+                               cached_statements=self.cached_statements)
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        with self._cond:
+            self._stats["checkouts"] += 1
+            if not self._idle and self._open >= self.max_connections:
+                self._stats["waits"] += 1
+                if not self._cond.wait_for(
+                        lambda: self._idle or self._open < self.max_connections, self.timeout):
+                    raise PoolTimeout(
+                        f"No database connection free after {self.timeout}s")
+            if self._idle:
+                self._stats["reused"] += 1
+                return self._idle.pop()
+            self._open += 1
+
+        try:
+            conn = self._connect()
+        except sqlite3.Error:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _release(self, conn):
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out this thread's connection, rolling back on error."""
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        except sqlite3.Error as e:
+            with self._cond:
+                self._stats["errors"] += 1
+                if "locked" in str(e):
+                    self._stats["locked_errors"] += 1
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+
+    def stats(self):
+        """Return a snapshot of pool counters."""
+        with self._cond:
+            return dict(
+                self._stats,
+                open=self._open,
+                idle=len(self._idle),
+                in_use=self._open - len(self._idle),
+                max_connections=self.max_connections,
+            )
+
+    def close(self):
+        """Close every idle connection. Checked-out connections are left alone."""
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._open -= 1
+            self._cond.notify_all()
@@ -0,0 +1,175 @@
+"""
+Streaming export of the SRT history for audits.
+
+Every srt_info row is joined with the cadet, activity and status names and
+the names of the cadet's groups, and written as CSV or JSON Lines, gzipped
+if asked. Rows go from the cursor straight to the file in the order they
+were booked, so memory use does not grow with the history.
+
+Filters: --since/--until (inclusive days, a created_ts range), --group
+(chat id or name) and --activity (id or name). The database must be
+migrated, which the bot does when it starts.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m db.exporter history.csv.gz --since 2026-01-01 --until 2026-03-31
+    python -m db.exporter - --format jsonl --group "Flight 1"
+"""
+import argparse
+import csv
+import gzip
+import json
+import sqlite3
+import sys
+import time
+from datetime import date
+
+from db.timestamps import day_range
+
+COLUMNS = ("srt_id", "cadet", "telegram_id", "groups", "activity", "status",
+           "created_on", "datetime_in", "datetime_out")
+
+EXPORT_QUERY = """
+    SELECT
+        srt_info.srt_id,
+        cadet.name,
+        cadet.telegram_id,
+        (SELECT group_concat('group'.name, '; ')
+         FROM cadet_group JOIN 'group' ON 'group'.group_id = cadet_group.group_id
+         WHERE cadet_group.cadet_id = srt_info.cadet_id),
+        activity.name,
+        status.name,
+        srt_info.created_on,
+        srt_info.datetime_in,
+        srt_info.datetime_out
+    FROM srt_info
+    LEFT JOIN cadet ON cadet.cadet_id = srt_info.cadet_id
+    LEFT JOIN activity ON activity.activity_id = srt_info.activity_id
+    LEFT JOIN status ON status.status_id = srt_info.status_id
+"""
+
+
+def export_rows(conn, since=None, until=None, group=None, activity=None):
+    """Yield history rows in COLUMNS order, one at a time from the cursor; filters as for export_query()."""
+    yield from conn.execute(*export_query(since, until, group, activity))
+
+
+def export_query(since=None, until=None, group=None, activity=None):
+    """
+    Build the export statement and its parameters for the given filters.
+
+    Args:
+        since (date): First day to include, by created_on.
+        until (date): Last day to include.
+        group (str): Only cadets in this group, by chat id or name.
+        activity (str): Only this activity, by id or name.
+    """
+    where, params = [], []
+    if since is not None:
+        where.append("srt_info.created_ts >= ?")
+        params.append(day_range(since)[0])
+    if until is not None:
+        # Half-open, so the whole of the last day is included
+        where.append("srt_info.created_ts < ?")
+        params.append(day_range(until)[1])
+    if group is not None:
+        where.append("""srt_info.cadet_id IN (
+            SELECT cadet_id FROM cadet_group
+            WHERE group_id IN (SELECT group_id FROM 'group' WHERE tele_id = ? OR name = ?))""")
+        params += [group, group]
+    if activity is not None:
+        where.append("""srt_info.activity_id IN (
+            SELECT activity_id FROM activity WHERE activity_id = ? OR name = ?)""")
+        params += [activity, activity]
+
+    query = EXPORT_QUERY
+    if where:
+        query += "WHERE " + "\n    AND ".join(where)
+    # Both orders come straight from an index, so SQLite never sorts the export
+    if since is not None or until is not None:
+        query += "\nORDER BY srt_info.created_ts, srt_info.srt_id"
+    else:
+        query += "\nORDER BY srt_info.srt_id"
+    return query, params
+
+
+def write_csv(rows, f):
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(rows, f):
+    count = 0
+    for row in rows:
+        f.write(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False))
+        f.write("\n")
+        count += 1
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+def open_output(path, compress):
+    if path == "-":
+        if compress:
+            return gzip.open(sys.stdout.buffer, "wt", compresslevel=6, newline="")
+        return sys.stdout
+    if compress:
+        return gzip.open(path, "wt", compresslevel=6, encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def export(conn, path, fmt="csv", compress=None, **filters):
+    """
+    Write the filtered history to `path` ("-" for stdout).
+
+    `compress` defaults to True when `path` ends in .gz.
+
+    Returns:
+        dict: rows, seconds and rows_per_s.
+    """
+    if compress is None:
+        compress = path.endswith(".gz")
+    started = time.perf_counter()
+    f = open_output(path, compress)
+    try:
+        count = WRITERS[fmt](export_rows(conn, **filters), f)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+        else:
+            f.flush()
+    elapsed = time.perf_counter() - started
+    return {"rows": count, "seconds": round(elapsed, 3),
+            "rows_per_s": round(count / elapsed) if elapsed else 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the SRT history.")
+    parser.add_argument("output", help='file to write, "-" for stdout; .gz compresses')
+    parser.add_argument("--database", default="db/srt.db")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument("--gzip", action="store_true", default=None)
+    parser.add_argument("--since", type=date.fromisoformat)
+    parser.add_argument("--until", type=date.fromisoformat)
+    parser.add_argument("--group", help="chat id or name")
+    parser.add_argument("--activity", help="id or name")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    try:
+        result = export(conn, args.output, args.format, args.gzip, since=args.since,
+                        until=args.until, group=args.group, activity=args.activity)
+    finally:
+        conn.close()
+    print(f"Exported {result['rows']} rows in {result['seconds']:.2f}s "
+          f"({result['rows_per_s']:,} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
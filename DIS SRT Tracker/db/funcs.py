@@ -0,0 +1,67 @@
+"""
+Named-query registry for the repository modules (db/cadet.py, db/group.py,
+db/cadet_group.py and db/srt_info.py) and the statements the bot runs on
+every update from db/rollups.py and db/persistence.py.
+
+Each module registers its SQL once at import with query() and runs it by
+name. The same string goes to sqlite3 on every call, so each pooled
+connection's statement cache (see ConnectionPool's cached_statements)
+returns the statement it prepared the first time instead of parsing the
+SQL again. Only the admin commands (exports, reports, rollup rebuilds and
+imports) keep their SQL inline.
+"""
+import sqlite3
+import textwrap
+
+# name -> SQL
+QUERIES = {}
+
+
+def query(name, sql):
+    """Register `sql` under `name` and return the name."""
+    if name in QUERIES:
+        raise ValueError(f"Query {name!r} is already registered")
+    QUERIES[name] = textwrap.dedent(sql).strip()
+    return name
+
+
+def execute(conn, name, params=()):
+    return conn.execute(QUERIES[name], params)
+
+
+def execute_many(conn, name, rows):
+    """Run the named statement once per parameter tuple in `rows`; returns the rows changed."""
+    return conn.executemany(QUERIES[name], rows).rowcount
+
+
+def fetch_one(conn, name, params=()):
+    return conn.execute(QUERIES[name], params).fetchone()
+
+
+def fetch_all(conn, name, params=()):
+    return conn.execute(QUERIES[name], params).fetchall()
+
+
+def fetch_value(conn, name, params=()):
+    """First column of the first row, or None if there is no row."""
+    row = conn.execute(QUERIES[name], params).fetchone()
+    return row[0] if row else None
+
+
+def check(conn):
+    """
+    Compile every registered query against `conn`'s schema.
+
+    Returns:
+        dict: name -> error message for each query SQLite cannot prepare.
+    """
+    errors = {}
+    for name, sql in QUERIES.items():
+        try:
+            conn.execute(f"EXPLAIN {sql}")
+        except sqlite3.ProgrammingError:
+            # Prepared fine, only the parameters are missing
+            pass
+        except sqlite3.Error as e:
+            errors[name] = str(e)
+    return errors
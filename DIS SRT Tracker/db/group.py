@@ -0,0 +1,35 @@
+"""Group chat rows, keyed by their Telegram chat ID (tele_id)."""
+from db.funcs import execute, fetch_all, fetch_one, query
+
+BY_TELE_ID = query("group.by_tele_id", """
+    SELECT group_id, name FROM 'group' WHERE tele_id = ?
+""")
+INSERT = query("group.insert", """
+    INSERT INTO 'group' (tele_id, name) VALUES (?, ?)
+""")
+LIVE_ROSTERS = query("group.live_rosters", """
+    SELECT tele_id, live_message_id FROM 'group' WHERE live_message_id IS NOT NULL
+""")
+SET_LIVE_MESSAGE = query("group.set_live_message", """
+    UPDATE 'group' SET live_message_id = ? WHERE tele_id = ?
+""")
+
+
+def find(conn, tele_id):
+    """(group_id, name) for a group chat, or None if the bot has not seen it."""
+    return fetch_one(conn, BY_TELE_ID, (tele_id, ))
+
+
+def insert(conn, tele_id, name):
+    """Add a group chat and return its group_id."""
+    return execute(conn, INSERT, (tele_id, name)).lastrowid
+
+
+def live_rosters(conn):
+    """(tele_id, live_message_id) for every group with a live roster message."""
+    return fetch_all(conn, LIVE_ROSTERS)
+
+
+def set_live_message(conn, tele_id, message_id):
+    """Point the group at its live roster message, or stop it with None."""
+    execute(conn, SET_LIVE_MESSAGE, (message_id, tele_id))
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class IdentityCache:
+    """
+    Bounded telegram_id -> (cadet_id, name) cache with LRU eviction and a TTL.
+
+    A cadet's row never changes after registration, so the TTL only guards
+    against manual edits to the cadet table.
+
+    Args:
+        maxsize (int): Entries kept before the least recently used is evicted.
+        ttl (float): Seconds an entry stays valid.
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, telegram_id):
+        """Return the cached (cadet_id, name), or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(telegram_id)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, expires = entry
+            if expires <= self._clock():
+                del self._entries[telegram_id]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(telegram_id)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, telegram_id, cadet_id, name):
+        with self._lock:
+            self._entries[telegram_id] = ((cadet_id, name), self._clock() + self.ttl)
+            self._entries.move_to_end(telegram_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, telegram_id=None):
+        """Drop one entry, or everything when no telegram_id is given."""
+        with self._lock:
+            if telegram_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(telegram_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                size=len(self._entries),
+                maxsize=self.maxsize,
+                hit_rate=round(self._stats["hits"] / lookups, 3) if lookups else None,
+            )
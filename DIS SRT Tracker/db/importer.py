@@ -0,0 +1,251 @@
+"""
+Bulk import of cadets, groups and group memberships from CSV.
+
+cadets.csv has a header row with telegram_id and name, and optionally
+telegram_username and group_chat_id. Cadets are upserted on telegram_id and
+put in 'No Group' like a cadet who registers through /start; a
+group_chat_id also adds them to that group. groups.csv has group_chat_id
+and name, and is upserted on the chat id. Import groups first so cadets can
+join them.
+
+Rows are read one at a time and written in chunks with executemany, one
+transaction per chunk, so memory stays flat however long the file is. A
+chunk that breaks a constraint (e.g. a name already used by another cadet)
+is retried row by row and only the offending rows are rejected. --dry-run
+does all of the work in one transaction and rolls it back.
+
+Names changed by an import reach the running bot once its identity cache
+entries expire.
+
+Run from the "DIS SRT Tracker" directory:
+    python -m db.importer groups groups.csv
+    python -m db.importer cadets cadets.csv --dry-run
+"""
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from itertools import islice
+
+from db.cadet_group import NO_GROUP_ID
+from db.connection import DEFAULT_PRAGMAS
+
+# Rejected rows printed per import; the rest are only counted
+MAX_REPORTED = 20
+
+UPSERT_CADET = """
+    INSERT INTO cadet (telegram_id, telegram_username, name) VALUES (?, ?, ?)
+    ON CONFLICT (telegram_id) DO UPDATE SET
+        telegram_username = excluded.telegram_username,
+        name = excluded.name
+    WHERE telegram_username IS NOT excluded.telegram_username OR name IS NOT excluded.name
+"""
+JOIN_NO_GROUP = """
+    INSERT INTO cadet_group (cadet_id, group_id)
+    SELECT cadet_id, ? FROM cadet WHERE telegram_id = ?
+    ON CONFLICT (cadet_id, group_id) DO NOTHING
+"""
+JOIN_GROUP = """
+    INSERT INTO cadet_group (cadet_id, group_id)
+    SELECT cadet.cadet_id, 'group'.group_id
+    FROM cadet, 'group'
+    WHERE cadet.telegram_id = ? AND 'group'.tele_id = ?
+    ON CONFLICT (cadet_id, group_id) DO NOTHING
+"""
+UPDATE_GROUP = "UPDATE 'group' SET name = ? WHERE tele_id = ? AND name IS NOT ?"
+INSERT_GROUP = """
+    INSERT INTO 'group' (tele_id, name)
+    SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM 'group' WHERE tele_id = ?)
+"""
+
+
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.memberships = 0
+        self.rejected = []
+        self.rejected_count = 0
+        self.started = time.perf_counter()
+
+    def reject(self, line, reason):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REPORTED:
+            self.rejected.append((line, reason))
+
+    def report(self, kind, dry_run):
+        elapsed = time.perf_counter() - self.started
+        unchanged = self.rows - self.inserted - self.updated - self.rejected_count
+        lines = [
+            f"{'Would import' if dry_run else 'Imported'} {self.rows} {kind} rows in "
+            f"{elapsed:.2f}s ({self.rows / elapsed if elapsed else 0:,.0f} rows/s): "
+            f"{self.inserted} new, {self.updated} updated, {unchanged} unchanged, "
+            f"{self.rejected_count} rejected, {self.memberships} group memberships added"
+        ]
+        lines += [f"  line {line}: {reason}" for line, reason in self.rejected]
+        if self.rejected_count > len(self.rejected):
+            lines.append(f"  ... and {self.rejected_count - len(self.rejected)} more")
+        return "\n".join(lines)
+
+
+def read_csv(path, required):
+    """Yield (line_number, row) for each data row, checking the header has `required`."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in required if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+        for row in reader:
+            yield reader.line_num, row
+
+
+def _int(value):
+    value = (value or "").strip()
+    return int(value) if value else None
+
+
+def parse_cadets(rows, stats):
+    """Turn CSV rows into (line, telegram_id, username, name, group_chat_id), rejecting bad ones."""
+    for line, row in rows:
+        stats.rows += 1
+        try:
+            telegram_id = _int(row["telegram_id"])
+            group_chat_id = _int(row.get("group_chat_id"))
+        except ValueError:
+            stats.reject(line, "telegram_id and group_chat_id must be whole numbers")
+            continue
+        name = (row["name"] or "").strip()
+        if telegram_id is None or not name:
+            stats.reject(line, "telegram_id and name are required")
+            continue
+        username = (row.get("telegram_username") or "").strip().lstrip("@") or None
+        yield line, telegram_id, username, name, group_chat_id
+
+
+def parse_groups(rows, stats):
+    """Turn CSV rows into (line, group_chat_id, name), rejecting bad ones."""
+    for line, row in rows:
+        stats.rows += 1
+        try:
+            group_chat_id = _int(row["group_chat_id"])
+        except ValueError:
+            stats.reject(line, "group_chat_id must be a whole number")
+            continue
+        name = (row["name"] or "").strip()
+        if group_chat_id is None or not name:
+            stats.reject(line, "group_chat_id and name are required")
+            continue
+        yield line, group_chat_id, name
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _write_cadets(conn, chunk, stats):
+    before = conn.execute("SELECT COALESCE(max(cadet_id), 0) FROM cadet").fetchone()[0]
+    changes = conn.total_changes
+    conn.executemany(UPSERT_CADET, [row[1:4] for row in chunk])
+    upserted = conn.total_changes - changes
+    inserted = conn.execute("SELECT count(*) FROM cadet WHERE cadet_id > ?", (before, )).fetchone()[0]
+
+    changes = conn.total_changes
+    conn.executemany(JOIN_NO_GROUP, [(NO_GROUP_ID, row[1]) for row in chunk])
+    conn.executemany(JOIN_GROUP, [(row[1], row[4]) for row in chunk if row[4] is not None])
+    stats.memberships += conn.total_changes - changes
+    stats.inserted += inserted
+    stats.updated += upserted - inserted
+
+
+def _write_groups(conn, chunk, stats):
+    changes = conn.total_changes
+    conn.executemany(UPDATE_GROUP, [(name, chat_id, name) for _, chat_id, name in chunk])
+    updated = conn.total_changes - changes
+    changes = conn.total_changes
+    conn.executemany(INSERT_GROUP, [(chat_id, name, chat_id) for _, chat_id, name in chunk])
+    stats.inserted += conn.total_changes - changes
+    stats.updated += updated
+
+
+def write_chunks(conn, rows, write, stats, chunk_size=1000, dry_run=False):
+    """
+    Write `rows` in chunks of `chunk_size`, committing after each unless `dry_run`.
+
+    A chunk that raises IntegrityError is rolled back and written one row at
+    a time, so only the rows that break a constraint are rejected.
+    """
+    conn.execute("BEGIN")
+    try:
+        for chunk in chunks(rows, chunk_size):
+            conn.execute("SAVEPOINT chunk")
+            try:
+                write(conn, chunk, stats)
+            except sqlite3.IntegrityError:
+                conn.execute("ROLLBACK TO chunk")
+                for row in chunk:
+                    conn.execute("SAVEPOINT row")
+                    try:
+                        write(conn, [row], stats)
+                    except sqlite3.IntegrityError as e:
+                        conn.execute("ROLLBACK TO row")
+                        stats.reject(row[0], str(e))
+                    conn.execute("RELEASE row")
+            conn.execute("RELEASE chunk")
+            if not dry_run:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+        conn.execute("ROLLBACK" if dry_run else "COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    return stats
+
+
+def import_cadets(conn, path, chunk_size=1000, dry_run=False):
+    stats = ImportStats()
+    rows = parse_cadets(read_csv(path, ("telegram_id", "name")), stats)
+    return write_chunks(conn, rows, _write_cadets, stats, chunk_size, dry_run)
+
+
+def import_groups(conn, path, chunk_size=1000, dry_run=False):
+    stats = ImportStats()
+    rows = parse_groups(read_csv(path, ("group_chat_id", "name")), stats)
+    return write_chunks(conn, rows, _write_groups, stats, chunk_size, dry_run)
+
+
+def connect(database):
+    """Autocommit connection, so write_chunks controls the transactions."""
+    conn = sqlite3.connect(database, isolation_level=None)
+    for pragma in DEFAULT_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import cadets or groups from CSV.")
+    parser.add_argument("kind", choices=("cadets", "groups"))
+    parser.add_argument("csv")
+    parser.add_argument("--database", default="db/srt.db")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true",
+                        help="check and count everything, then roll back")
+    args = parser.parse_args()
+
+    importer = import_cadets if args.kind == "cadets" else import_groups
+    conn = connect(args.database)
+    try:
+        stats = importer(conn, args.csv, args.chunk_size, args.dry_run)
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        conn.close()
+    print(stats.report(args.kind, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
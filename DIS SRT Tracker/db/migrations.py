@@ -0,0 +1,159 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (version, description, sql) applied in order; the applied version is kept
+# in PRAGMA user_version. cadet.telegram_id and cadet_group(cadet_id, group_id)
+# are already covered by the UNIQUE constraints in create_schema.py.
+MIGRATIONS = [
+    (1, "Indexes for the srt_info and group lookups", """
+        CREATE INDEX IF NOT EXISTS idx_srt_info_cadet_created
+            ON srt_info (cadet_id, created_on DESC);
+        CREATE INDEX IF NOT EXISTS idx_srt_info_created_date
+            ON srt_info (date(created_on));
+        CREATE INDEX IF NOT EXISTS idx_srt_info_activity_status
+            ON srt_info (activity_id, status_id);
+        CREATE INDEX IF NOT EXISTS idx_group_tele_id
+            ON 'group' (tele_id);
+    """),
+    (2, "srt_current: one row per cadet for their latest booking", """
+        CREATE TABLE IF NOT EXISTS srt_current (
+            cadet_id INTEGER PRIMARY KEY,
+            srt_id INTEGER NOT NULL,
+            activity_id INTEGER,
+            datetime_in VARCHAR,
+            datetime_out VARCHAR,
+            created_on VARCHAR NOT NULL,
+            status_id INTEGER,
+            FOREIGN KEY (cadet_id) REFERENCES cadet (cadet_id) ON DELETE CASCADE,
+            FOREIGN KEY (srt_id) REFERENCES srt_info (srt_id) ON DELETE CASCADE,
+            FOREIGN KEY (activity_id) REFERENCES activity (activity_id) ON DELETE CASCADE,
+            FOREIGN KEY (status_id) REFERENCES status (status_id) ON DELETE CASCADE
+        );
+        INSERT OR REPLACE INTO srt_current
+            (cadet_id, srt_id, activity_id, datetime_in, datetime_out, created_on, status_id)
+        SELECT cadet_id, srt_id, activity_id, datetime_in, datetime_out, created_on, status_id
+        FROM srt_info
+        WHERE srt_id = (
+            SELECT latest.srt_id
+            FROM srt_info AS latest
+            WHERE latest.cadet_id = srt_info.cadet_id
+            ORDER BY latest.created_on DESC
+            LIMIT 1
+        );
+        CREATE INDEX IF NOT EXISTS idx_srt_current_activity_status
+            ON srt_current (activity_id, status_id);
+    """),
+    (3, "srt_daily_rollup: per day, cadet and activity totals", """
+        CREATE TABLE IF NOT EXISTS srt_daily_rollup (
+            day VARCHAR NOT NULL,
+            cadet_id INTEGER NOT NULL,
+            activity_id INTEGER NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            minutes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, cadet_id, activity_id),
+            FOREIGN KEY (cadet_id) REFERENCES cadet (cadet_id) ON DELETE CASCADE,
+            FOREIGN KEY (activity_id) REFERENCES activity (activity_id) ON DELETE CASCADE
+        );
+        INSERT OR REPLACE INTO srt_daily_rollup (day, cadet_id, activity_id, sessions, completed, minutes)
+        SELECT
+            date(created_on), cadet_id, activity_id,
+            count(*),
+            count(datetime_out),
+            COALESCE(sum(CAST(round((julianday(datetime_out) - julianday(datetime_in)) * 1440) AS INTEGER)), 0)
+        FROM srt_info
+        WHERE cadet_id IS NOT NULL AND activity_id IS NOT NULL
+        GROUP BY date(created_on), cadet_id, activity_id;
+    """),
+    (4, "Conversation states and user_data kept across restarts", """
+        CREATE TABLE IF NOT EXISTS persisted_user_data (
+            user_id INTEGER NOT NULL,
+            key VARCHAR NOT NULL,
+            value VARCHAR NOT NULL,
+            PRIMARY KEY (user_id, key)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS persisted_conversation (
+            name VARCHAR NOT NULL,
+            key VARCHAR NOT NULL,
+            state VARCHAR NOT NULL,
+            PRIMARY KEY (name, key)
+        ) WITHOUT ROWID;
+    """),
+    (5, "Live roster message per group, NULL until the group opts in", """
+        ALTER TABLE 'group' ADD COLUMN live_message_id INTEGER;
+    """),
+    (6, "Epoch seconds next to the TEXT timestamps, for range queries", """
+        ALTER TABLE srt_info ADD COLUMN created_ts INTEGER;
+        ALTER TABLE srt_info ADD COLUMN in_ts INTEGER;
+        ALTER TABLE srt_info ADD COLUMN out_ts INTEGER;
+        ALTER TABLE srt_current ADD COLUMN created_ts INTEGER;
+        ALTER TABLE srt_current ADD COLUMN in_ts INTEGER;
+        ALTER TABLE srt_current ADD COLUMN out_ts INTEGER;
+        -- The TEXT columns hold local time; 'utc' converts it before %s
+        UPDATE srt_info SET
+            created_ts = CAST(strftime('%s', created_on, 'utc') AS INTEGER),
+            in_ts = CAST(strftime('%s', datetime_in, 'utc') AS INTEGER),
+            out_ts = CAST(strftime('%s', datetime_out, 'utc') AS INTEGER);
+        UPDATE srt_current SET
+            created_ts = CAST(strftime('%s', created_on, 'utc') AS INTEGER),
+            in_ts = CAST(strftime('%s', datetime_in, 'utc') AS INTEGER),
+            out_ts = CAST(strftime('%s', datetime_out, 'utc') AS INTEGER);
+        CREATE INDEX IF NOT EXISTS idx_srt_info_created_ts
+            ON srt_info (created_ts);
+        CREATE INDEX IF NOT EXISTS idx_srt_current_status_created_ts
+            ON srt_current (status_id, created_ts);
+    """),
+    (7, "cadet_group by group, for the group rosters", """
+        CREATE INDEX IF NOT EXISTS idx_cadet_group_group_cadet
+            ON cadet_group (group_id, cadet_id);
+    """),
+    (8, "Drop the srt_info indexes no query uses since srt_current", """
+        DROP INDEX IF EXISTS idx_srt_info_cadet_created;
+        DROP INDEX IF EXISTS idx_srt_info_created_date;
+        DROP INDEX IF EXISTS idx_srt_info_activity_status;
+    """),
+]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """
+    Apply every migration newer than the database's schema version.
+
+    Each migration runs in its own transaction together with the version bump,
+    so a failed migration leaves the database at the previous version.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    version = get_schema_version(conn)
+    for target, description, sql in migrations:
+        if target <= version:
+            continue
+        logger.info("Applying migration %s: %s", target, description)
+        try:
+            conn.executescript(
+                f"BEGIN;\n{sql}\nPRAGMA user_version = {int(target)};\nCOMMIT;")
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        version = target
+    return version
+
+
+def explain(conn, query, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for `query`."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def uses_index(plan, table):
+    """True if no step of `plan` scans `table` without an index."""
+    return not any(
+        step.startswith(f"SCAN {table}") and "INDEX" not in step
+        for step in plan
+    )
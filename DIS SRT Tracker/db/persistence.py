@@ -0,0 +1,176 @@
+import json
+import threading
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from db.funcs import execute, execute_many, fetch_all, query
+
+LOAD_USER = query("persistence.load_user", """
+    SELECT key, value FROM persisted_user_data WHERE user_id = ?
+""")
+SAVE_USER_KEY = query("persistence.save_user_key", """
+    INSERT INTO persisted_user_data (user_id, key, value) VALUES (?, ?, ?)
+    ON CONFLICT (user_id, key) DO UPDATE SET value = excluded.value
+""")
+DELETE_USER_KEY = query("persistence.delete_user_key", """
+    DELETE FROM persisted_user_data WHERE user_id = ? AND key = ?
+""")
+DELETE_USER = query("persistence.delete_user", """
+    DELETE FROM persisted_user_data WHERE user_id = ?
+""")
+LOAD_CONVERSATIONS = query("persistence.load_conversations", """
+    SELECT key, state FROM persisted_conversation WHERE name = ?
+""")
+SAVE_CONVERSATION = query("persistence.save_conversation", """
+    INSERT INTO persisted_conversation (name, key, state) VALUES (?, ?, ?)
+    ON CONFLICT (name, key) DO UPDATE SET state = excluded.state
+""")
+DELETE_CONVERSATION = query("persistence.delete_conversation", """
+    DELETE FROM persisted_conversation WHERE name = ? AND key = ?
+""")
+
+
+def save_user_data(conn, user_id, changed, removed):
+    execute_many(conn, SAVE_USER_KEY, [(user_id, key, value) for key, value in changed.items()])
+    execute_many(conn, DELETE_USER_KEY, [(user_id, key) for key in removed])
+
+
+def drop_user_data(conn, user_id):
+    execute(conn, DELETE_USER, (user_id, ))
+
+
+def save_conversation(conn, name, key, state):
+    if state is None:
+        execute(conn, DELETE_CONVERSATION, (name, key))
+    else:
+        execute(conn, SAVE_CONVERSATION, (name, key, state))
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Keep ConversationHandler states and user_data in srt.db across restarts.
+
+    user_data is stored one row per (user, key) as JSON and written as a
+    diff: only keys whose value changed since the last write are upserted,
+    and removed keys are deleted. A user's rows are read the first time
+    one of their updates arrives, not at startup. Conversation states are
+    small (one row per chat) and PTB needs them up front, so they are read
+    when the ConversationHandler starts.
+
+    Reads run on the AsyncDatabase workers and writes go through the
+    WriteQueue, so a persistence flush is committed with the bookings in the
+    same batches.
+
+    Args:
+        connect: Zero-argument callable returning a connection context manager.
+        db (AsyncDatabase): Runs the reads off the event loop.
+        writes (WriteQueue): Commits the writes.
+        update_interval (float): Seconds between PTB's persistence flushes.
+    """
+
+    def __init__(self, connect, db, writes, update_interval=60):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False,
+                                        user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._connect = connect
+        self._db = db
+        self._writes = writes
+        # user_id -> {key: json} as last read or written
+        self._saved = {}
+        self._lock = threading.Lock()
+        self._stats = {"users_loaded": 0, "keys_written": 0, "keys_deleted": 0,
+                       "conversations_written": 0}
+
+    def _load_user(self, user_id):
+        with self._connect() as conn:
+            return dict(fetch_all(conn, LOAD_USER, (user_id, )))
+
+    def _load_conversations(self, name):
+        with self._connect() as conn:
+            return fetch_all(conn, LOAD_CONVERSATIONS, (name, ))
+
+    # user_data
+
+    async def get_user_data(self):
+        # Loaded per user in refresh_user_data instead
+        return {}
+
+    async def refresh_user_data(self, user_id, user_data):
+        if user_id in self._saved:
+            return
+        stored = await self._db.run(self._load_user, user_id)
+        if user_id in self._saved:
+            return
+        self._saved[user_id] = stored
+        with self._lock:
+            self._stats["users_loaded"] += 1
+        for key, value in stored.items():
+            user_data.setdefault(key, json.loads(value))
+
+    async def update_user_data(self, user_id, data):
+        saved = self._saved.setdefault(user_id, {})
+        current = {key: json.dumps(value) for key, value in data.items()}
+        changed = {key: value for key, value in current.items() if saved.get(key) != value}
+        removed = [key for key in saved if key not in current]
+        if not changed and not removed:
+            return
+        await self._writes.run_async(save_user_data, user_id, changed, removed)
+        self._saved[user_id] = current
+        with self._lock:
+            self._stats["keys_written"] += len(changed)
+            self._stats["keys_deleted"] += len(removed)
+
+    async def drop_user_data(self, user_id):
+        self._saved.pop(user_id, None)
+        await self._writes.run_async(drop_user_data, user_id)
+
+    # Conversations
+
+    async def get_conversations(self, name):
+        rows = await self._db.run(self._load_conversations, name)
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name, key, new_state):
+        state = None if new_state is None else json.dumps(new_state)
+        await self._writes.run_async(save_conversation, name, json.dumps(key), state)
+        with self._lock:
+            self._stats["conversations_written"] += 1
+
+    # Not stored: bot_data, chat_data and callback_data
+
+    async def get_bot_data(self):
+        return {}
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def get_chat_data(self):
+        return {}
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def flush(self):
+        # Every write has already been committed by the WriteQueue
+        pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, users_cached=len(self._saved))
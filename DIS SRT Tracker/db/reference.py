@@ -0,0 +1,58 @@
+import threading
+
+
+class ReferenceData:
+    """
+    In-memory copy of the activity and status tables.
+
+    Both tables are tiny and only change when an admin edits them, so they
+    are read once and served from memory until reload() is called.
+
+    Args:
+        connect: Zero-argument callable returning a connection context manager.
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._activities = []
+        self._activity_ids = {}
+        self._activity_names = {}
+        self._status_ids = {}
+
+    def reload(self):
+        """Re-read both tables and swap them in."""
+        with self._connect() as conn:
+            activities = conn.execute(
+                "SELECT activity_id, name FROM activity ORDER BY activity_id").fetchall()
+            statuses = conn.execute("SELECT status_id, name FROM status").fetchall()
+
+        with self._lock:
+            self._activities = activities
+            self._activity_ids = {name: activity_id for activity_id, name in activities}
+            self._activity_names = dict(activities)
+            self._status_ids = {name: status_id for status_id, name in statuses}
+            self._loaded = True
+        return len(activities), len(statuses)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.reload()
+
+    def activities(self):
+        """Return [(activity_id, name), ...] in activity_id order."""
+        self._ensure_loaded()
+        return self._activities
+
+    def activity_id(self, name):
+        self._ensure_loaded()
+        return self._activity_ids.get(name)
+
+    def activity_name(self, activity_id):
+        self._ensure_loaded()
+        return self._activity_names.get(activity_id)
+
+    def status_id(self, name):
+        self._ensure_loaded()
+        return self._status_ids.get(name)
@@ -0,0 +1,148 @@
+"""
+Daily SRT totals per cadet and activity, kept in srt_daily_rollup.
+
+Bookings and check-outs update the rollup in the same transaction as the
+booking itself; rebuild() recomputes everything from srt_info in one pass.
+
+Rebuild from the "DIS SRT Tracker" directory:
+    python -m db.rollups --rebuild
+"""
+import argparse
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from db.funcs import execute, query
+
+MINUTES_BETWEEN = "CAST(round((julianday({end}) - julianday({start})) * 1440) AS INTEGER)"
+
+ADD_BOOKING = query("rollups.add_booking", """
+    INSERT INTO srt_daily_rollup (day, cadet_id, activity_id, sessions)
+    VALUES (date(?), ?, ?, 1)
+    ON CONFLICT (day, cadet_id, activity_id) DO UPDATE SET
+        sessions = sessions + 1
+""")
+
+# Check-outs count the open srt_current booking(s) picked by {where}
+ADD_CHECK_OUTS = f"""
+    INSERT INTO srt_daily_rollup (day, cadet_id, activity_id, completed, minutes)
+    SELECT
+        date(created_on), cadet_id, activity_id, 1,
+        COALESCE({MINUTES_BETWEEN.format(start="datetime_in", end="?")}, 0)
+    FROM srt_current
+    WHERE {{where}} AND datetime_out IS NULL
+    ON CONFLICT (day, cadet_id, activity_id) DO UPDATE SET
+        completed = completed + excluded.completed,
+        minutes = minutes + excluded.minutes
+"""
+ADD_CHECK_OUT = query("rollups.add_check_out", ADD_CHECK_OUTS.format(where="cadet_id = ?"))
+ADD_ALL_CHECK_OUTS = query("rollups.add_all_check_outs", ADD_CHECK_OUTS.format(where="status_id = ?"))
+
+
+def add_booking(conn, cadet_id, activity_id, created_on):
+    execute(conn, ADD_BOOKING, (created_on, cadet_id, activity_id))
+
+
+def add_check_out(conn, cadet_id, datetime_out):
+    """Count the cadet's current booking as completed. Call before srt_current is updated."""
+    execute(conn, ADD_CHECK_OUT, (datetime_out, cadet_id))
+
+
+def add_all_check_outs(conn, datetime_out, status_id):
+    """
+    Count every open booking with `status_id` as completed, in one statement.
+    Call before srt_current is updated. Returns the number of rollup rows touched.
+    """
+    return execute(conn, ADD_ALL_CHECK_OUTS, (datetime_out, status_id)).rowcount
+
+
+def rebuild(conn):
+    """Recompute every rollup row from srt_info. Returns the number of rows written."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM srt_daily_rollup")
+        cursor = conn.execute(
+            f"""
+            INSERT INTO srt_daily_rollup (day, cadet_id, activity_id, sessions, completed, minutes)
+            SELECT
+                date(created_on), cadet_id, activity_id,
+                count(*),
+                count(datetime_out),
+                COALESCE(sum({MINUTES_BETWEEN.format(start="datetime_in", end="datetime_out")}), 0)
+            FROM srt_info
+            WHERE cadet_id IS NOT NULL AND activity_id IS NOT NULL
+            GROUP BY date(created_on), cadet_id, activity_id
+            """
+        )
+        conn.commit()
+        return cursor.rowcount
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def report_range(period, today=None):
+    """Return (first_day, last_day) for 'day' (today) or 'week' (Monday to today)."""
+    today = today or date.today()
+    if period == "week":
+        return today - timedelta(days=today.weekday()), today
+    return today, today
+
+
+def get_report(conn, first_day, last_day):
+    """
+    Sum the rollups between two days, inclusive.
+
+    Returns:
+        tuple: (per-activity rows, per-cadet rows), each row being
+        (name, sessions, completed, minutes).
+    """
+    params = (first_day.isoformat(), last_day.isoformat())
+    activities = conn.execute(
+        """
+        SELECT activity.name, sum(sessions), sum(completed), sum(minutes)
+        FROM srt_daily_rollup
+        JOIN activity ON srt_daily_rollup.activity_id = activity.activity_id
+        WHERE day BETWEEN ? AND ?
+        GROUP BY srt_daily_rollup.activity_id
+        ORDER BY srt_daily_rollup.activity_id
+        """,
+        params,
+    ).fetchall()
+    cadets = conn.execute(
+        """
+        SELECT cadet.name, sum(sessions), sum(completed), sum(minutes)
+        FROM srt_daily_rollup
+        JOIN cadet ON srt_daily_rollup.cadet_id = cadet.cadet_id
+        WHERE day BETWEEN ? AND ?
+        GROUP BY srt_daily_rollup.cadet_id
+        ORDER BY sum(minutes) DESC, cadet.name
+        """,
+        params,
+    ).fetchall()
+    return activities, cadets
+
+
+def format_report_rows(rows):
+    return "\n".join(
+        f"{name} | {sessions} sessions | {minutes} min | "
+        f"{round(100 * completed / sessions) if sessions else 0}% completed"
+        for name, sessions, completed, minutes in rows
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the SRT daily rollups.")
+    parser.add_argument("--database", default="db/srt.db")
+    parser.add_argument("--rebuild", action="store_true", required=True)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    started = time.perf_counter()
+    rows = rebuild(conn)
+    conn.close()
+    print(f"Rebuilt {rows} rollup rows in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
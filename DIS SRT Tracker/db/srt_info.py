@@ -0,0 +1,216 @@
+"""
+SRT bookings: the append-only srt_info history and srt_current, each cadet's
+latest booking, so check-in, check-out and the roster never touch old rows.
+
+The record_* mutations take the connection the write queue hands them and
+run inside its batch transaction. Each TEXT timestamp is written together
+with its epoch column (*_ts).
+"""
+from db import rollups
+from db.funcs import execute, execute_many, fetch_all, fetch_one, fetch_value, query
+from db.timestamps import day_range, to_epoch
+
+INSERT_HISTORY = query("srt_info.insert_history", """
+    INSERT INTO srt_info (cadet_id, activity_id, datetime_in, datetime_out, created_on, status_id,
+                          in_ts, out_ts, created_ts)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+""")
+UPSERT_CURRENT = query("srt_info.upsert_current", """
+    INSERT INTO srt_current (cadet_id, srt_id, activity_id, datetime_in, datetime_out, created_on, status_id,
+                             in_ts, out_ts, created_ts)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (cadet_id) DO UPDATE SET
+        srt_id = excluded.srt_id,
+        activity_id = excluded.activity_id,
+        datetime_in = excluded.datetime_in,
+        datetime_out = excluded.datetime_out,
+        created_on = excluded.created_on,
+        status_id = excluded.status_id,
+        in_ts = excluded.in_ts,
+        out_ts = excluded.out_ts,
+        created_ts = excluded.created_ts
+""")
+
+# Check-in and check-out stamp one column pair of the cadet's current booking
+STAMP_HISTORY = """
+    UPDATE srt_info
+    SET {column} = ?, {ts} = ?, status_id = ?
+    WHERE srt_id = (SELECT srt_id FROM srt_current WHERE cadet_id = ?)
+"""
+STAMP_CURRENT = """
+    UPDATE srt_current
+    SET {column} = ?, {ts} = ?, status_id = ?
+    WHERE cadet_id = ?
+"""
+CHECK_IN = (query("srt_info.check_in_history", STAMP_HISTORY.format(column="datetime_in", ts="in_ts")),
+            query("srt_info.check_in_current", STAMP_CURRENT.format(column="datetime_in", ts="in_ts")))
+CHECK_OUT = (query("srt_info.check_out_history", STAMP_HISTORY.format(column="datetime_out", ts="out_ts")),
+             query("srt_info.check_out_current", STAMP_CURRENT.format(column="datetime_out", ts="out_ts")))
+
+CLOSE_HISTORY = query("srt_info.close_history", """
+    UPDATE srt_info
+    SET datetime_out = ?, out_ts = ?, status_id = ?
+    WHERE srt_id IN (
+        SELECT srt_id FROM srt_current WHERE status_id = ? AND datetime_out IS NULL
+    )
+""")
+CLOSE_CURRENT = query("srt_info.close_current", """
+    UPDATE srt_current
+    SET datetime_out = ?, out_ts = ?, status_id = ?
+    WHERE status_id = ? AND datetime_out IS NULL
+""")
+EXPIRE_PENDING = query("srt_info.expire_pending", """
+    DELETE FROM srt_current WHERE status_id = ? AND created_ts < ?
+""")
+
+STATUS = query("srt_info.status", """
+    SELECT status_id FROM srt_current WHERE cadet_id = ?
+""")
+DASHBOARD = query("srt_info.dashboard", """
+    SELECT
+        cadet.cadet_id,
+        cadet.name AS cadet_name,
+        activity.name AS activity_name,
+        srt_current.in_ts,
+        srt_current.out_ts,
+        status.name AS status_name,
+        srt_current.status_id,
+        srt_current.created_ts >= ? AND srt_current.created_ts < ?
+    FROM
+        cadet
+    LEFT JOIN srt_current ON srt_current.cadet_id = cadet.cadet_id
+    LEFT JOIN activity ON srt_current.activity_id = activity.activity_id
+    LEFT JOIN status ON srt_current.status_id = status.status_id
+    WHERE cadet.telegram_id = ?
+""")
+ROSTER = query("srt_info.roster", """
+    SELECT
+        activity.activity_id,
+        activity.name AS activity_name,
+        cadet.name AS cadet_name,
+        srt_current.in_ts
+    FROM
+        activity
+    JOIN
+        srt_current ON srt_current.activity_id = activity.activity_id
+    JOIN
+        cadet ON srt_current.cadet_id = cadet.cadet_id
+    WHERE
+        srt_current.status_id != ?
+    ORDER BY
+        activity.activity_id, srt_current.srt_id
+""")
+# CROSS JOIN fixes the join order and INDEXED BY the index: the group's
+# members come off idx_cadet_group_group_cadet and only their srt_current
+# rows are read, so the cost follows the group's size however many cadets
+# are registered. Without them, statistics from a database where every
+# cadet is in 'No Group' make the planner scan cadet_group instead.
+# Taking one chat id rather than a list also matters: with several outer
+# rows the planner builds a Bloom filter over all of srt_current first.
+GROUP_ROSTER = query("srt_info.group_roster", """
+    SELECT
+        activity.activity_id,
+        activity.name AS activity_name,
+        cadet.name AS cadet_name,
+        srt_current.in_ts
+    FROM
+        'group'
+    CROSS JOIN
+        cadet_group INDEXED BY idx_cadet_group_group_cadet ON cadet_group.group_id = 'group'.group_id
+    CROSS JOIN
+        srt_current ON srt_current.cadet_id = cadet_group.cadet_id
+    JOIN
+        activity ON srt_current.activity_id = activity.activity_id
+    JOIN
+        cadet ON srt_current.cadet_id = cadet.cadet_id
+    WHERE
+        'group'.tele_id = ? AND srt_current.status_id != ?
+    ORDER BY
+        activity.activity_id, srt_current.srt_id
+""")
+
+
+def record_booking(conn, cadet_id, activity_id, datetime_in, datetime_out, created_on, status_id):
+    """Append a booking to the history, make it the cadet's current one and return its srt_id."""
+    timestamps = (to_epoch(datetime_in), to_epoch(datetime_out), to_epoch(created_on))
+    srt_id = execute(conn, INSERT_HISTORY, (cadet_id, activity_id, datetime_in,
+                                            datetime_out, created_on, status_id, *timestamps)).lastrowid
+    execute(conn, UPSERT_CURRENT, (cadet_id, srt_id, activity_id, datetime_in,
+                                   datetime_out, created_on, status_id, *timestamps))
+    rollups.add_booking(conn, cadet_id, activity_id, created_on)
+    return srt_id
+
+
+def record_bookings(conn, rows):
+    """record_booking for each argument tuple in `rows`; returns the new srt_ids."""
+    # Each srt_current row needs its own srt_info rowid, so this cannot be one executemany
+    return [record_booking(conn, *row) for row in rows]
+
+
+def _stamp(conn, statements, rows):
+    history, current = statements
+    rows = [(stamp, to_epoch(stamp), status_id, cadet_id) for stamp, status_id, cadet_id in rows]
+    execute_many(conn, history, rows)
+    return execute_many(conn, current, rows)
+
+
+def record_check_in(conn, datetime_in, status_id, cadet_id):
+    _stamp(conn, CHECK_IN, [(datetime_in, status_id, cadet_id)])
+
+
+def record_check_ins(conn, rows):
+    """Check in each (datetime_in, status_id, cadet_id); returns the number of bookings changed."""
+    return _stamp(conn, CHECK_IN, rows)
+
+
+def record_check_out(conn, datetime_out, status_id, cadet_id):
+    rollups.add_check_out(conn, cadet_id, datetime_out)
+    _stamp(conn, CHECK_OUT, [(datetime_out, status_id, cadet_id)])
+
+
+def close_day(conn, datetime_out, ongoing_id, completed_id, pending_id):
+    """
+    Check out every ongoing booking at `datetime_out` and clear bookings made
+    before it that were never started, as one set of statements.
+
+    Returns:
+        dict: Rows touched by each step.
+    """
+    out_ts = to_epoch(datetime_out)
+    params = (datetime_out, out_ts, completed_id, ongoing_id)
+    rollup_rows = rollups.add_all_check_outs(conn, datetime_out, ongoing_id)
+    history_rows = execute(conn, CLOSE_HISTORY, params).rowcount
+    checked_out = execute(conn, CLOSE_CURRENT, params).rowcount
+    # srt_info keeps them as Pending Approval; the roster and menus start clean
+    expired = execute(conn, EXPIRE_PENDING, (pending_id, out_ts)).rowcount
+    return {"checked_out": checked_out, "history_rows": history_rows,
+            "rollup_rows": rollup_rows, "expired_bookings": expired}
+
+
+def status(conn, cadet_id):
+    """status_id of the cadet's current booking, or None if there is none."""
+    return fetch_value(conn, STATUS, (cadet_id, ))
+
+
+def dashboard(conn, telegram_id):
+    """
+    The cadet menus' row: (cadet_id, cadet_name, activity_name, in_ts, out_ts,
+    status_name, status_id, booked_today). Booking columns are None without a
+    booking; the row is None if the cadet is not registered.
+    """
+    return fetch_one(conn, DASHBOARD, (*day_range(), telegram_id))
+
+
+def roster(conn, completed_id):
+    """(activity_id, activity_name, cadet_name, in_ts) for every booking not completed."""
+    return fetch_all(conn, ROSTER, (completed_id, ))
+
+
+def group_roster(conn, tele_id, completed_id):
+    """roster() limited to the members of the group chat `tele_id`."""
+    return fetch_all(conn, GROUP_ROSTER, (tele_id, completed_id))
+
+
+def group_rosters(conn, tele_ids, completed_id):
+    """{tele_id: group_roster() rows} for every chat in `tele_ids`, reusing one prepared statement."""
+    return {tele_id: group_roster(conn, tele_id, completed_id) for tele_id in tele_ids}
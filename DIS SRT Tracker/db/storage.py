@@ -0,0 +1,134 @@
+"""
+SQLite storage profile: the journal, sync and cache settings every pooled
+connection is opened with.
+
+The defaults put srt.db in WAL mode, so roster and menu reads no longer wait
+for a check-in commit, with synchronous=NORMAL, so a commit only syncs the
+WAL at checkpoints instead of on every transaction. A JSON file with any of
+the SETTINGS keys overrides the defaults, and SRT_SQLITE_<SETTING>
+environment variables (e.g. SRT_SQLITE_MMAP_SIZE=0) override both.
+
+    {"synchronous": "full", "cache_size": -64000}
+
+maintain() checkpoints the WAL and runs PRAGMA optimize; the bot runs it
+every STORAGE_MAINTENANCE_INTERVAL seconds. journal_size_limit truncates
+the WAL file back to that size after a checkpoint.
+"""
+import json
+import os
+
+from db.connection import DEFAULT_PRAGMAS
+
+ENV_PREFIX = "SRT_SQLITE_"
+
+# setting -> allowed values (None for any integer)
+SETTINGS = {
+    "journal_mode": ("delete", "truncate", "persist", "memory", "wal", "off"),
+    "synchronous": ("off", "normal", "full", "extra"),
+    "temp_store": ("default", "file", "memory"),
+    "mmap_size": None,
+    "cache_size": None,
+    "busy_timeout": None,
+    "journal_size_limit": None,
+}
+
+DEFAULT_PROFILE = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "temp_store": "memory",
+    # 256 MiB of the file mapped instead of copied into the page cache
+    "mmap_size": 256 * 2 ** 20,
+    # Negative: KiB rather than pages, here 16 MiB per connection
+    "cache_size": -16000,
+    "busy_timeout": 5000,
+    "journal_size_limit": 64 * 2 ** 20,
+}
+
+# What PRAGMA <setting> reads back for the named values
+_READ_BACK = {
+    "synchronous": {"off": 0, "normal": 1, "full": 2, "extra": 3},
+    "temp_store": {"default": 0, "file": 1, "memory": 2},
+}
+
+
+def _parse(setting, value):
+    allowed = SETTINGS.get(setting)
+    if setting not in SETTINGS:
+        raise ValueError(f"Unknown storage setting {setting!r}")
+    if allowed is None:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Storage setting {setting} must be an integer, not {value!r}") from None
+    value = str(value).lower()
+    if value not in allowed:
+        raise ValueError(f"Storage setting {setting} must be one of {', '.join(allowed)}")
+    return value
+
+
+def load_profile(path=None, environ=os.environ):
+    """
+    Build the storage profile from the defaults, the JSON file at `path`
+    (skipped if it does not exist) and SRT_SQLITE_* variables in `environ`.
+
+    Raises:
+        ValueError: For unknown settings or values SQLite would not accept.
+    """
+    profile = dict(DEFAULT_PROFILE)
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for setting, value in json.load(f).items():
+                profile[setting] = _parse(setting, value)
+    for setting in SETTINGS:
+        value = environ.get(ENV_PREFIX + setting.upper())
+        if value is not None:
+            profile[setting] = _parse(setting, value)
+    return profile
+
+
+def pragmas(profile):
+    """Connection pragmas for ConnectionPool: DEFAULT_PRAGMAS plus the profile."""
+    # busy_timeout comes from the profile, and goes first so switching to WAL can wait for a lock
+    statements = [pragma for pragma in DEFAULT_PRAGMAS if "busy_timeout" not in pragma]
+    statements += [f"PRAGMA {setting} = {profile[setting]}"
+                   for setting in sorted(profile, key=lambda setting: setting != "busy_timeout")]
+    return tuple(statements)
+
+
+def applied(conn):
+    """Read every SETTINGS pragma back from `conn`."""
+    return {setting: conn.execute(f"PRAGMA {setting}").fetchone()[0] for setting in SETTINGS}
+
+
+def verify(conn, profile):
+    """
+    Compare `profile` with what SQLite actually applied on `conn`.
+
+    journal_mode=wal is refused on some filesystems, and mmap_size is capped
+    by how SQLite was compiled, so a setting can silently not take effect.
+
+    Returns:
+        dict: setting -> (wanted, applied) for every setting that differs.
+    """
+    current = applied(conn)
+    mismatches = {}
+    for setting, wanted in profile.items():
+        expected = _READ_BACK.get(setting, {}).get(wanted, wanted)
+        if current[setting] != expected:
+            mismatches[setting] = (wanted, current[setting])
+    return mismatches
+
+
+def maintain(conn, mode="PASSIVE"):
+    """
+    Checkpoint the WAL into the database file and let SQLite refresh its
+    statistics. PASSIVE never waits for readers or writers, so it is safe to
+    run while the bot is serving.
+
+    Returns:
+        dict: busy (1 if the checkpoint could not finish), wal_frames and
+        checkpointed frames; all -1 when the database is not in WAL mode.
+    """
+    busy, wal_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    conn.execute("PRAGMA optimize")
+    return {"busy": busy, "wal_frames": wal_frames, "checkpointed": checkpointed}
@@ -0,0 +1,50 @@
+"""
+Conversions between the TEXT timestamps the bot has always stored and the
+integer epoch columns (created_ts, in_ts, out_ts) queries filter on.
+
+Both are local time: the TEXT columns hold datetime.now() formatted with
+TIMESTAMP_FORMAT, and the epoch columns the same instant in seconds.
+"""
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def to_epoch(text):
+    """Epoch seconds for a TIMESTAMP_FORMAT string; None stays None."""
+    if text is None:
+        return None
+    return int(datetime.strptime(text, TIMESTAMP_FORMAT).timestamp())
+
+
+def day_range(first_day=None, last_day=None):
+    """
+    Half-open [start, end) epoch seconds covering `first_day` to `last_day`.
+
+    Both default to today, so `created_ts >= start AND created_ts < end`
+    selects today's rows from an index instead of parsing every row.
+    """
+    first_day = first_day or date.today()
+    return _day_range(first_day, last_day or first_day)
+
+
+@lru_cache(maxsize=64)
+def _day_range(first_day, last_day):
+    start = datetime.combine(first_day, datetime.min.time())
+    end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def clock(ts):
+    """HHMM for an epoch, the way menus and rosters show times; None stays None."""
+    if ts is None:
+        return None
+    return _clock(ts // 60)
+
+
+@lru_cache(maxsize=4096)
+def _clock(minute):
+    # Check-ins bunch up, so most rows of a roster hit a cached minute
+    return time.strftime("%H%M", time.localtime(minute * 60))
@@ -0,0 +1,153 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class WriteQueue:
+    """
+    Group-commit queue for small booking mutations.
+
+    A single writer thread drains the queue and applies everything waiting
+    (up to `max_batch` operations) in one transaction, so a burst of
+    check-ins costs one lock and one fsync instead of one each. A lone write
+    commits straight away; only while a burst is in progress does the writer
+    wait up to `max_delay` seconds for the next operation. Each operation runs inside its own SAVEPOINT, so a failing
+    operation only fails its own caller.
+
+    An operation is a callable `op(conn, *args)`. Its return value, or the
+    exception it raised, is handed back to the caller.
+
+    Args:
+        connect: Zero-argument callable returning a connection context manager.
+        max_batch (int): Most operations committed together.
+        max_delay (float): Longest wait for the next operation during a burst.
+        max_pending (int): Bound on queued operations before submitters wait.
+    """
+
+    def __init__(self, connect, max_batch=200, max_delay=0.005, max_pending=1000):
+        self._connect = connect
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"operations": 0, "failed": 0, "batches": 0,
+                       "largest_batch": 0, "waits": 0}
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._worker, name="srt-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, op, *args):
+        """Queue `op(conn, *args)`, blocking while the queue is full."""
+        self._ensure_started()
+        future = Future()
+        item = (op, args, future)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["waits"] += 1
+            self._queue.put(item)
+        return future
+
+    def run(self, op, *args, timeout=None):
+        """Queue an operation and block until its batch has committed."""
+        return self.submit(op, *args).result(timeout)
+
+    async def run_async(self, op, *args):
+        """Queue an operation without blocking the event loop and await its result."""
+        self._ensure_started()
+        future = Future()
+        item = (op, args, future)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["waits"] += 1
+            await asyncio.to_thread(self._queue.put, item)
+        return await asyncio.wrap_future(future)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = None
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                # Nothing else waiting: a lone write commits now, a burst
+                # waits at most `max_delay` in total for more operations
+                if len(batch) == 1:
+                    break
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_delay
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            self._commit(self._collect(first))
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for op, args, _ in batch:
+                    conn.execute("SAVEPOINT op")
+                    try:
+                        results.append((op(conn, *args), None))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO op")
+                        results.append((None, e))
+                    conn.execute("RELEASE op")
+                conn.commit()
+        except Exception as e:
+            results = [(None, e)] * len(batch)
+
+        failed = 0
+        for (_, _, future), (result, error) in zip(batch, results):
+            if error is None:
+                future.set_result(result)
+            else:
+                failed += 1
+                future.set_exception(error)
+
+        with self._stats_lock:
+            self._stats["operations"] += len(batch)
+            self._stats["failed"] += failed
+            self._stats["batches"] += 1
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats, pending=self._queue.qsize())
+        stats["mean_batch"] = round(stats["operations"] / stats["batches"], 1) if stats["batches"] else 0
+        return stats
+
+    def close(self):
+        """Commit whatever is queued and stop the writer thread."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
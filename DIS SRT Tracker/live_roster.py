@@ -0,0 +1,134 @@
+import asyncio
+import logging
+
+from telegram.error import BadRequest, Forbidden, TelegramError
+
+logger = logging.getLogger(__name__)
+
+
+class LiveRoster:
+    """
+    Keep one roster message per opted-in group chat up to date.
+
+    Handlers call `changed()` after a booking, check-in or check-out. The
+    first change starts a `debounce`-second timer and every change before it
+    fires joins the same refresh, so a burst of taps becomes one edit per
+    group. A refresh renders every group's own roster with one `render`
+    call and edits the groups whose text changed, with at most
+    `max_concurrent` edits in flight, which leaves the outbound
+    scheduler's global budget free for the cadets' private chats. A change
+    that arrives during a refresh schedules one more, even if that refresh
+    failed.
+
+    Groups whose message was deleted, or that removed the bot, are passed to
+    `forget` and dropped from later refreshes.
+
+    Args:
+        render: Coroutine function called with a list of chat_ids, returning
+            {chat_id: roster text}, or None on a DB error.
+        targets: Coroutine function returning [(chat_id, message_id), ...].
+        forget: Coroutine function called with a chat_id whose message is gone.
+        debounce (float): Seconds to wait for more changes before editing.
+        max_concurrent (int): Group edits in flight at once.
+    """
+
+    def __init__(self, render, targets, forget, debounce=3.0, max_concurrent=4):
+        self.debounce = debounce
+        self.max_concurrent = max_concurrent
+        self._render = render
+        self._targets = targets
+        self._forget = forget
+        self._task = None
+        self._pending = False
+        # chat_id -> (message_id, text) last shown there
+        self._shown = {}
+        self._stats = {"changes": 0, "refreshes": 0, "edits": 0, "unchanged": 0,
+                       "failed": 0, "forgotten": 0, "peak_in_flight": 0}
+
+    def changed(self, bot):
+        """Note that the roster changed; the groups are edited after the debounce."""
+        self._stats["changes"] += 1
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(bot))
+        else:
+            self._pending = True
+
+    async def _run(self, bot):
+        try:
+            while True:
+                await asyncio.sleep(self.debounce)
+                self._pending = False
+                try:
+                    await self.refresh(bot)
+                except Exception:
+                    # Keep serving the changes that arrived meanwhile
+                    self._stats["failed"] += 1
+                    logger.exception("Live roster refresh failed")
+                if not self._pending:
+                    break
+        finally:
+            self._task = None
+
+    async def refresh(self, bot):
+        """Render every live group's roster and edit its message to show it."""
+        targets = await self._targets()
+        if not targets:
+            return
+        # One render for all groups, so a refresh never competes with the
+        # private chats for more than one database slot
+        texts = await self._render([chat_id for chat_id, _ in targets])
+        if texts is None:
+            return
+        self._stats["refreshes"] += 1
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        in_flight = 0
+
+        async def edit(chat_id, message_id):
+            nonlocal in_flight
+            text = texts[chat_id]
+            if self._shown.get(chat_id) == (message_id, text):
+                self._stats["unchanged"] += 1
+                return
+            async with semaphore:
+                in_flight += 1
+                self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], in_flight)
+                try:
+                    await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+                except BadRequest as e:
+                    if "not modified" not in e.message.lower():
+                        # Message deleted or too old to edit
+                        await self._drop(chat_id)
+                        return
+                except Forbidden:
+                    await self._drop(chat_id)
+                    return
+                except TelegramError:
+                    self._stats["failed"] += 1
+                    return
+                finally:
+                    in_flight -= 1
+            self._shown[chat_id] = (message_id, text)
+            self._stats["edits"] += 1
+
+        await asyncio.gather(*(edit(chat_id, message_id) for chat_id, message_id in targets))
+
+    async def _drop(self, chat_id):
+        self._shown.pop(chat_id, None)
+        self._stats["forgotten"] += 1
+        await self._forget(chat_id)
+
+    def shown(self, chat_id, message_id, text):
+        """Record a roster message sent outside a refresh, e.g. by /live."""
+        self._shown[chat_id] = (message_id, text)
+
+    async def shutdown(self):
+        """Cancel a refresh that is still waiting out its debounce."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self):
+        return dict(self._stats, groups=len(self._shown), scheduled=int(self._task is not None))
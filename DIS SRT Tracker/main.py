@@ -1,7 +1,12 @@
 
 import logging
+import os
+import shlex
 import sqlite3
-from datetime import datetime
+import tempfile
+import time
+from datetime import date, datetime, time as dt_time
+from itertools import groupby
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import (
     Application,
@@ -12,11 +17,97 @@ from telegram.ext import (
     MessageHandler, filters
 )
 
+from db import (
+    cadet as cadet_repo, cadet_group as cadet_group_repo, exporter, group as group_repo, rollups,
+    srt_info as srt_info_repo, storage
+)
+from db.async_db import AsyncDatabase
+from db.connection import ConnectionPool
+from db.identity_cache import IdentityCache
+from db.migrations import migrate
+from db.persistence import SQLitePersistence
+from db.reference import ReferenceData
+from db.srt_info import close_day, record_booking, record_check_in, record_check_out
+from db.timestamps import clock
+from db.write_queue import WriteQueue
+from live_roster import LiveRoster
+from metrics import Metrics
+from outbound import OutboundScheduler
+from update_processor import CadetUpdateProcessor
+
 # from db.helper import check_cadet_exists, insert_cadet, insert_group, insert_srt_info, get_activities, get_status_id, get_cadet_id_by_tele_id, get_activity_id_by_activity_name
 
 # Database connection
 DATABASE_URL = "db/srt.db"
+# JSON storage profile for srt.db (WAL, synchronous, cache...), see db/storage.py.
+# Used if the file exists; SRT_SQLITE_* environment variables override it.
+STORAGE_PROFILE = os.environ.get("SRT_STORAGE_PROFILE", "db/storage.json")
+# Seconds between WAL checkpoints and PRAGMA optimize
+STORAGE_MAINTENANCE_INTERVAL = 600
 CUTOFF_TIME = 21  #12am
+# Telegram IDs allowed to run admin commands such as /reload
+ADMIN_IDS = []
+# Prometheus metrics on http://127.0.0.1:<port>/metrics, None to disable
+METRICS_PORT = 9108
+# Write a JSON summary of the metrics here on shutdown, None to skip
+METRICS_DUMP = None
+# Public HTTPS URL Telegram should post updates to, e.g.
+# "https://bot.example.com/telegram". None keeps long polling.
+# Needs the webhooks extra: pip install "python-telegram-bot[webhooks]"
+WEBHOOK_URL = None
+# Local address the webhook listener binds to, behind the reverse proxy
+WEBHOOK_LISTEN = "127.0.0.1"
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = "telegram"
+# Telegram sends this back in X-Telegram-Bot-Api-Secret-Token; other posts are rejected
+WEBHOOK_SECRET = None
+# Cadets served at the same time; each cadet's own updates still run in order
+CONCURRENT_UPDATES = 32
+# Seconds between saving changed conversation states and user_data to srt.db
+PERSISTENCE_INTERVAL = 5
+# Seconds a roster change waits so the changes after it share one edit; groups allow ~20 a minute
+LIVE_ROSTER_DEBOUNCE = 3
+# Live roster edits in flight at once, so private chats keep most of the send budget
+LIVE_ROSTER_CONCURRENCY = 4
+
+# Status names as seeded by db/populate_tables.py
+PENDING, ONGOING, COMPLETED = "Pending Approval", "Ongoing", "Completed"
+
+# Handler and SQL latency histograms plus DB error counts
+metrics = Metrics()
+# journal_mode, synchronous and cache settings for every pooled connection
+storage_profile = storage.load_profile(STORAGE_PROFILE)
+# Shared connections for every helper below
+pool = ConnectionPool(DATABASE_URL, factory=metrics.connection_factory(),
+                      pragmas=storage.pragmas(storage_profile))
+# Handlers await helpers through this instead of blocking the event loop
+db = AsyncDatabase(max_workers=4, max_pending=64)
+# Activity and status rows, read once and kept in memory
+refdata = ReferenceData(lambda: pool.connection())
+# telegram_id -> (cadet_id, name) for registered cadets
+identities = IdentityCache(maxsize=4096, ttl=3600)
+# Bookings, check-ins and check-outs are committed together in small batches
+writes = WriteQueue(lambda: pool.connection(), max_batch=200, max_delay=0.005)
+# Runs different cadets' updates concurrently and each cadet's serially
+updates = CadetUpdateProcessor(CONCURRENT_UPDATES)
+# Keeps replies and menu edits within Telegram's flood limits
+outbound = OutboundScheduler()
+# Roster messages edited in place in the groups that asked for one with /live
+live_rosters = LiveRoster(
+    lambda chat_ids: render_rosters(chat_ids),
+    lambda: db.run(get_live_rosters),
+    lambda chat_id: db.run(set_live_roster, chat_id, None),
+    debounce=LIVE_ROSTER_DEBOUNCE,
+    max_concurrent=LIVE_ROSTER_CONCURRENCY,
+)
+
+metrics.add_collector("srt_pool", lambda: pool.stats())
+metrics.add_collector("srt_db_queue", lambda: db.stats())
+metrics.add_collector("srt_write_queue", lambda: writes.stats())
+metrics.add_collector("srt_identity_cache", lambda: identities.stats())
+metrics.add_collector("srt_updates", lambda: updates.stats())
+metrics.add_collector("srt_outbound", lambda: outbound.stats())
+metrics.add_collector("srt_live_roster", lambda: live_rosters.stats())
 
 # Enable logging
 logging.basicConfig(
@@ -28,373 +119,166 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 
-def check_cadet_exists(tele_id):
+def load_cadet(telegram_id):
+    """Read (cadet_id, name) for a telegram_id and remember it in the identity cache."""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT name FROM cadet WHERE telegram_id = ?", (tele_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result  # Returns name if exists, None otherwise
+        with pool.connection() as conn:
+            result = cadet_repo.find(conn, telegram_id)
+            if result:
+                identities.put(telegram_id, *result)
+            return result
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return None
 
 
+def lookup_cadet(telegram_id):
+    """Return (cadet_id, name) for a telegram_id, reading the DB only on a cache miss."""
+    return identities.get(telegram_id) or load_cadet(telegram_id)
+
+
 def insert_cadet(telegram_id, username, name):
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        # Insert user data into the cadet table
-        cursor.execute(
-            """
-            INSERT INTO cadet (telegram_id, telegram_username, name)
-            VALUES (?, ?, ?)
-            """,
-            (telegram_id, username, name),
-        )
-
-        conn.commit()
-        conn.close()
-        return True
+        with pool.connection() as conn:
+            # Insert user data into the cadet table
+            cadet_id = cadet_repo.insert(conn, telegram_id, username, name)
+            conn.commit()
+            identities.put(telegram_id, cadet_id, name)
+            return True
 
     except sqlite3.IntegrityError as e:
         print(f"Database error: {e}")
         return False
 
 
-def get_activities():
-    try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-        cursor.execute("SELECT activity_id, name FROM activity")
-        activities = cursor.fetchall()
-        conn.close()
-        return activities
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return []
-
-
-# Helper function to insert SRT Info into the database
-def insert_srt_info(cadet_id, activity_id, datetime_in, datetime_out, created_on, status_id):
+async def queue_write(op, *args):
+    """Add a booking mutation to the next group commit and wait for it to land."""
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO srt_info (cadet_id, activity_id, datetime_in, datetime_out, created_on, status_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (cadet_id, activity_id, datetime_in,
-             datetime_out, created_on, status_id),
-        )
-        conn.commit()
-        conn.close()
+        await writes.run_async(op, *args)
         return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return False
 
 
-# Helper function to fetch the 'Ongoing' status ID
-def get_status_id(status_name="Ongoing"):
-    try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT status_id FROM status WHERE name = ?", (status_name,))
-        status_id = cursor.fetchone()
-        conn.close()
-        return status_id[0] if status_id else None
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return None
-
-
 def get_cadet_id_by_tele_id(telegram_id):
-    try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT cadet_id FROM cadet WHERE telegram_id = ?", (telegram_id,))
-        status_id = cursor.fetchone()
-        conn.close()
-        return status_id[0] if status_id else None
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return None
-
-
-def get_activity_id_by_activity_name(name):
-    try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT activity_id FROM activity WHERE name = ?", (name,))
-        status_id = cursor.fetchone()
-        conn.close()
-        return status_id[0] if status_id else None
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return None
+    cadet = lookup_cadet(telegram_id)
+    return cadet[0] if cadet else None
 
 
-DATABASE_URL = "db/srt.db"
-
-
-def get_srt_info(telegram_id):
-    try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT 
-            cadet.name AS cadet_name,
-            activity.name AS activity_name,
-            STRFTIME('%H%M', srt_info.datetime_in),
-            STRFTIME('%H%M', srt_info.datetime_out),
-            status.name AS status_name
-        FROM 
-            srt_info
-        JOIN cadet ON srt_info.cadet_id = cadet.cadet_id
-        JOIN activity ON srt_info.activity_id = activity.activity_id
-        JOIN status ON srt_info.status_id = status.status_id
-        WHERE cadet.telegram_id = ?
-        ORDER BY srt_info.created_on DESC
-        LIMIT 1
-        """
-        cursor.execute(query, (telegram_id, ))
-        rows = cursor.fetchall()
-
-        # Format the results
-        formatted_results = []
-        for row in rows:
-            cadet_name, activity_name, datetime_in, datetime_out, status_name = row
-            if not datetime_in and not datetime_out:
-                formatted_results.append(
-                    f"{cadet_name} | {activity_name} | {status_name}")
-            elif not datetime_out:
-                formatted_results.append(
-                    f"{cadet_name} | {activity_name} | Started at {datetime_in} | {status_name}")
-            else:
-                formatted_results.append(
-                    f"{cadet_name} | {activity_name} | Started at {datetime_in} | {datetime_out} | {status_name}")
-
-        conn.close()
-        return formatted_results[::-1][0]
-
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return []
+def format_srt_info(cadet_name, activity_name, datetime_in, datetime_out, status_name):
+    if not datetime_in and not datetime_out:
+        return f"{cadet_name} | {activity_name} | {status_name}"
+    elif not datetime_out:
+        return f"{cadet_name} | {activity_name} | Started at {datetime_in} | {status_name}"
+    else:
+        return f"{cadet_name} | {activity_name} | Started at {datetime_in} | {datetime_out} | {status_name}"
 
 
-def has_srt_record_today(telegram_id):
+def get_cadet_dashboard(telegram_id):
     """
-    Check if there is a record in the srt_info table for today for a specific cadet.
+    Fetch everything the cadet menus need in one query.
 
     Args:
         telegram_id (int): Telegram ID of the cadet.
 
     Returns:
-        bool: True if a record exists for today, False otherwise.
+        dict: cadet_id, name, status_id of the latest booking, whether that
+        booking was made today, and its formatted details. None if the cadet
+        is not registered.
     """
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT date(created_on)
-        FROM srt_info
-        JOIN cadet ON srt_info.cadet_id = cadet.cadet_id
-        WHERE cadet.telegram_id = ? AND date(created_on) = date('now')
-        LIMIT 1
-        """
-        cursor.execute(query, (telegram_id,))
-
-        result = cursor.fetchall()
-
-        conn.close()
-        if result:
-            return True
-        else:
-            return False
-        # return True
-        # else:
-        #     return False
-        # return result is not None
-
-    except sqlite3.Error as e:
-        print(f"Database error for has_srt: {e}")
-        return False
-
-
-def srt_check_in(datetime_in, status_id, cadet_id):
-    try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        # Update query
-        cursor.execute(
-            """
-            UPDATE srt_info
-            SET datetime_in = ?, status_id = ?
-            WHERE cadet_id = ?
-            """,
-            (datetime_in, status_id, cadet_id),
-        )
-
-        conn.commit()
-        conn.close()
-        return True
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return False
-
-
-def srt_check_out(datetime_out, status_id, cadet_id):
-    try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        # Update query
-        cursor.execute(
-            """
-            UPDATE srt_info
-            SET datetime_in = ?, status_id = ?
-            WHERE cadet_id = ?
-            """,
-            (datetime_out, status_id, cadet_id),
-        )
+        with pool.connection() as conn:
+            row = srt_info_repo.dashboard(conn, telegram_id)
+
+            if row is None:
+                return None
+
+            cadet_id, cadet_name, activity_name, in_ts, out_ts, status_name, status_id, today = row
+            return {
+                "cadet_id": cadet_id,
+                "name": cadet_name,
+                "status_id": status_id,
+                "booked_today": bool(today),
+                "details": format_srt_info(cadet_name, activity_name, clock(in_ts), clock(out_ts), status_name)
+                if status_id is not None else "No SRT booked.",
+            }
 
-        conn.commit()
-        conn.close()
-        return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-        return False
+        return None
 
 
 def check_status_exists(cadet_id):
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        # Query to check if a record exists
-        cursor.execute(
-            """
-            SELECT 
-                status.status_id
-            FROM 
-                srt_info
-            JOIN cadet ON srt_info.cadet_id = cadet.cadet_id
-            JOIN status ON srt_info.status_id = status.status_id
-            WHERE cadet.cadet_id = ?
-            ORDER BY 
-            srt_info.created_on DESC
-            LIMIT 1
-            """,
-            (cadet_id,)
-        )
+        with pool.connection() as conn:
+            result = srt_info_repo.status(conn, cadet_id)
 
-        result = cursor.fetchone()
-        # print(result)
-        # print(type(result))
+            if result is None:
+                print(f"No status found for cadet_id: {cadet_id}")
+                return None  # Return None explicitly if no record exists
 
-        if result is None:
-            print(f"No status found for cadet_id: {cadet_id}")
-            conn.close()
-            return None  # Return None explicitly if no record exists
-
-        result = result[0]
-        # print(result)
-
-        # print(type(result))
-        conn.close()
-        return result
-
-        # Return True if a record exists, False otherwise
+            return result
 
     except sqlite3.Error as e:
         print(f"Database error for checking status exists: {e}")
         return False
 
 
-def delete_srt_info_by_cadet_id(cadet_id):
+def get_group_chat_id(group_chat_id):
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        DELETE FROM srt_info
-        WHERE cadet_id = ?
-        """
-        cursor.execute(query, (cadet_id,))
-        conn.commit()
-        conn.close()
-        return True
+        with pool.connection() as conn:
+            return (group_chat_id,) if group_repo.find(conn, group_chat_id) else None
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-        return False
+        return None
 
 
-def get_group_chat_id(group_chat_id):
+def get_group_id(tele_group_chat_id):
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT tele_id
-        FROM 'group'
-        WHERE tele_id = ?
-        """
-        cursor.execute(query, (group_chat_id,))
-        rows = cursor.fetchone()
-
-        conn.close()
-        return rows
+        with pool.connection() as conn:
+            group = group_repo.find(conn, tele_group_chat_id)
+            return (group[0],) if group else None
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return None
 
 
-def get_group_id(tele_group_chat_id):
+def add_group(group_chat_id, name):
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT group_id
-        FROM 'group'
-        WHERE tele_id = ?
-        """
-        cursor.execute(query, (tele_group_chat_id,))
-        rows = cursor.fetchone()
-
-        conn.close()
-        return rows
+        with pool.connection() as conn:
+            group_repo.insert(conn, group_chat_id, name)
+            conn.commit()
+
+            print("Group added successfully")
+            return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-        return None
+        return False
 
 
-def add_group(group_chat_id, name):
+def get_live_rosters():
+    """
+    Fetch the groups that have a live roster message.
+
+    Returns:
+        list: (tele_id, live_message_id) for each such group.
+    """
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        INSERT INTO 'group' (tele_id, name)
-        VALUES (?, ?)
-        """
-        cursor.execute(query, (group_chat_id, name))
-        conn.commit()
-
-        conn.close()
-        print("Group added successfully")
-        return True
+        with pool.connection() as conn:
+            return group_repo.live_rosters(conn)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
+
+
+def set_live_roster(group_chat_id, message_id):
+    """Point the group at its live roster message, or stop it with None."""
+    try:
+        with pool.connection() as conn:
+            group_repo.set_live_message(conn, group_chat_id, message_id)
+            conn.commit()
+            return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return False
@@ -402,20 +286,8 @@ def add_group(group_chat_id, name):
 
 def check_if_cadet_in_no_group(cadet_id):
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT *
-        FROM cadet_group
-        WHERE cadet_id = ?
-        AND group_id = 1
-        """
-        cursor.execute(query, (cadet_id,))
-        rows = cursor.fetchall()
-
-        conn.close()
-        return rows
+        with pool.connection() as conn:
+            return cadet_group_repo.find(conn, cadet_id)
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return None
@@ -423,19 +295,12 @@ def check_if_cadet_in_no_group(cadet_id):
 
 def insert_cadet_into_no_group(cadet_id):
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        INSERT INTO cadet_group (cadet_id, group_id)
-        VALUES (?, 1)
-        """
-        cursor.execute(query, (cadet_id,))
-        conn.commit()
-
-        conn.close()
-        print("User inserted into no group successfully")
-        return True
+        with pool.connection() as conn:
+            cadet_group_repo.add(conn, cadet_id)
+            conn.commit()
+
+            print("User inserted into no group successfully")
+            return True
     except sqlite3.Error as e:
         print(f"Database error line 430: {e}")
         return False
@@ -443,20 +308,8 @@ def insert_cadet_into_no_group(cadet_id):
 
 def check_if_cadet_in_group(cadet_id, group_id):
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT *
-        FROM cadet_group
-        WHERE cadet_id = ?
-        AND group_id = ?
-        """
-        cursor.execute(query, (cadet_id, group_id))
-        rows = cursor.fetchall()
-
-        conn.close()
-        return rows
+        with pool.connection() as conn:
+            return cadet_group_repo.find(conn, cadet_id, group_id)
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return None
@@ -464,142 +317,97 @@ def check_if_cadet_in_group(cadet_id, group_id):
 
 def add_cadet_group(cadet_id, group_id):
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        INSERT INTO cadet_group (cadet_id, group_id)
-        VALUES (?, ?)
-        """
-        cursor.execute(query, (cadet_id, group_id))
-        conn.commit()
-
-        conn.close()
-        print("cadet added to group successfully")
-        return True
+        with pool.connection() as conn:
+            cadet_group_repo.add(conn, cadet_id, group_id)
+            conn.commit()
+
+            print("cadet added to group successfully")
+            return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return False
 
 
-def get_all_cadets_act_1_info():
-    try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT 
-            cadet.name AS cadet_name,
-            STRFTIME('%H%M', srt_info.datetime_in)
-        FROM 
-            srt_info
-        JOIN 
-            cadet ON srt_info.cadet_id = cadet.cadet_id
-        JOIN 
-            activity ON srt_info.activity_id = activity.activity_id
-        JOIN
-            status ON srt_info.status_id = status.status_id
-        WHERE
-            activity.activity_id = 1 AND status.status_id != 3
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        conn.close()
-        return rows
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return None
+def get_roster(group_chat_id=None):
+    """
+    Fetch every booking that is not completed, grouped by activity.
 
+    Args:
+        group_chat_id (int): Only include members of this group chat, as
+            recorded by /start in the group. Everyone if None.
 
-def get_all_cadets_act_2_info():
+    Returns:
+        list: (activity_name, [(cadet_name, started_at), ...]) in activity order.
+    """
+    if group_chat_id is not None:
+        rosters = get_group_rosters([group_chat_id])
+        return None if rosters is None else rosters[group_chat_id]
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT 
-            cadet.name AS cadet_name,
-            STRFTIME('%H%M', srt_info.datetime_in)
-        FROM 
-            srt_info
-        JOIN 
-            cadet ON srt_info.cadet_id = cadet.cadet_id
-        JOIN
-            status ON srt_info.status_id = status.status_id
-        JOIN 
-            activity ON srt_info.activity_id = activity.activity_id
-        WHERE
-            activity.activity_id = 2 AND status.status_id != 3
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        conn.close()
-        return rows
+        with pool.connection() as conn:
+            return group_by_activity(srt_info_repo.roster(conn, refdata.status_id(COMPLETED)))
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return None
 
 
-def get_all_cadets_act_3_info():
+def get_group_rosters(group_chat_ids):
+    """
+    Fetch the rosters of several group chats in one query.
+
+    Returns:
+        dict: group_chat_id -> roster as returned by get_roster, for every
+        id in `group_chat_ids`. None on a database error.
+    """
     try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT 
-            cadet.name AS cadet_name,
-            STRFTIME('%H%M', srt_info.datetime_in)
-        FROM 
-            srt_info
-        JOIN 
-            cadet ON srt_info.cadet_id = cadet.cadet_id
-        JOIN
-            status ON srt_info.status_id = status.status_id
-        JOIN 
-            activity ON srt_info.activity_id = activity.activity_id
-        WHERE
-            activity.activity_id = 3 AND status.status_id != 3
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        conn.close()
-        return rows
+        with pool.connection() as conn:
+            rosters = srt_info_repo.group_rosters(conn, group_chat_ids, refdata.status_id(COMPLETED))
+            return {group_chat_id: group_by_activity(rows) for group_chat_id, rows in rosters.items()}
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return None
 
 
-def get_all_cadets_act_4_info():
-    try:
-        conn = sqlite3.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT 
-            cadet.name AS cadet_name,
-            STRFTIME('%H%M', srt_info.datetime_in)
-        FROM 
-            srt_info
-        JOIN 
-            cadet ON srt_info.cadet_id = cadet.cadet_id
-        JOIN
-            status ON srt_info.status_id = status.status_id
-        JOIN 
-            activity ON srt_info.activity_id = activity.activity_id
-        WHERE
-            activity.activity_id = 4 AND status.status_id != 3
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        conn.close()
-        return rows
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
+def group_by_activity(rows):
+    """Roster from (activity_id, activity_name, cadet_name, in_ts) rows in activity order."""
+    return [
+        (activity_name, [(row[2], clock(row[3])) for row in activity_rows])
+        for (_, activity_name), activity_rows in groupby(rows, key=lambda row: row[:2])
+    ]
+
+
+def format_roster(roster):
+    """Roster message text for `roster` as returned by get_roster."""
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    response = f"Cadets participating in SRT on {current_date}:\n\n"
+
+    for activity_name, cadets in roster:
+        act_info = "\n".join(
+            f"{row[0]} | {'Not checked in' if row[1] is None else f'Started at {row[1]}'}"
+            for row in cadets
+        )
+        response += f"{activity_name}\n{act_info}\n\n"
+
+    # If no cadet information is available for all activities
+    if not roster:
+        if datetime.now().hour > CUTOFF_TIME:
+            response = f"All cadets have checked out."
+        else:
+            response = f"No cadets participating in SRT."
+
+    return response.strip()
+
+
+async def render_roster(group_chat_id=None):
+    roster = await db.run(get_roster, group_chat_id)
+    return None if roster is None else format_roster(roster)
+
+
+async def render_rosters(group_chat_ids):
+    """Roster text per group chat, read with one database call; None on a DB error."""
+    rosters = await db.run(get_group_rosters, group_chat_ids)
+    if rosters is None:
         return None
+    return {group_chat_id: format_roster(roster) for group_chat_id, roster in rosters.items()}
 
 
 # Define state constants
@@ -609,6 +417,32 @@ START_ROUTES, srt, srt_INFORMATION, ENTER_NAME, AGAIN = range(5)
 ONE, TWO, THREE, FOUR, FIVE, SIX = range(6)
 
 
+async def get_cadet(telegram_id):
+    """Resolve (cadet_id, name), skipping the DB worker entirely on a cache hit."""
+    return identities.get(telegram_id) or await db.run(load_cadet, telegram_id)
+
+
+async def get_cadet_id(telegram_id):
+    cadet = await get_cadet(telegram_id)
+    return cadet[0] if cadet else None
+
+
+def build_menu_keyboard(dashboard, show_details=True):
+    """Pick the menu buttons for the status of the cadet's booking today."""
+    status_id = dashboard["status_id"] if dashboard and dashboard["booked_today"] else None
+
+    if status_id == refdata.status_id(ONGOING):
+        row = [InlineKeyboardButton("Check Out SRT", callback_data=str(FIVE))]
+    elif status_id == refdata.status_id(PENDING):
+        row = [InlineKeyboardButton("Check In SRT", callback_data=str(THREE))]
+    else:
+        return InlineKeyboardMarkup([[InlineKeyboardButton("Book SRT Slot", callback_data=str(ONE))]])
+
+    if show_details:
+        row.append(InlineKeyboardButton("View SRT Details", callback_data=str(TWO)))
+    return InlineKeyboardMarkup([row])
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Send a welcome message and show the main menu."""
     chat_type = update.message.chat.type
@@ -622,75 +456,17 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data["telegram_id"] = telegram_id
     context.user_data["username"] = username
 
-    existing_cadet = check_cadet_exists(telegram_id)
+    existing_cadet = await get_cadet(telegram_id)
     if chat_type == "private":
 
         if existing_cadet:
 
-            context.user_data["cadet_id"] = get_cadet_id_by_tele_id(
-                context.user_data["telegram_id"])
-
-            await update.message.reply_text(f"Welcome, {existing_cadet[0]}!")
-
-            if has_srt_record_today(context.user_data['telegram_id']):
-
-                cadet_id = get_cadet_id_by_tele_id(
-                    context.user_data['telegram_id'])
-
-                if check_status_exists(cadet_id) == 2:
-                    keyboard = [
-                        [
-                            InlineKeyboardButton(
-                                "Check Out SRT", callback_data=str(FIVE)),
-                            InlineKeyboardButton(
-                                "View SRT Details", callback_data=str(TWO)),
-                        ]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    await update.message.reply_text("What would you like to do?", reply_markup=reply_markup)
-
-                elif check_status_exists(cadet_id) == 1:
-                    keyboard = [
-                        [
-                            InlineKeyboardButton(
-                                "Check In SRT", callback_data=str(THREE)),
-                            InlineKeyboardButton(
-                                "View SRT Details", callback_data=str(TWO)),
-                        ]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    await update.message.reply_text("What would you like to do?", reply_markup=reply_markup)
-                elif check_status_exists(cadet_id) == 3:
-
-                    # if datetime.now().hour < CUTOFF_TIME:
-                    if datetime.now():
-                        keyboard = [
-                            [
-                                InlineKeyboardButton(
-                                    "Book SRT Slot", callback_data=str(ONE)),
-                            ]
-                        ]
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-                        await update.message.reply_text("What would you like to do?", reply_markup=reply_markup)
-                    else:
-                        keyboard = [
-                            [
-                                InlineKeyboardButton(
-                                    "Closed", callback_data='hi'),
-                            ]
-                        ]
-                        reply_markup = InlineKeyboardMarkup(keyboard)
-                        await update.message.reply_text("SRT bookings closed.", reply_markup=reply_markup)
-
-            else:
-                keyboard = [
-                    [
-                        InlineKeyboardButton(
-                            "Book SRT Slot", callback_data=str(ONE)),
-                    ]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text("What would you like to do?", reply_markup=reply_markup)
+            context.user_data["cadet_id"] = existing_cadet[0]
+
+            dashboard = await db.run(get_cadet_dashboard, telegram_id)
+
+            await update.message.reply_text(f"Welcome, {existing_cadet[1]}!")
+            await update.message.reply_text("What would you like to do?", reply_markup=build_menu_keyboard(dashboard))
 
             return START_ROUTES
 
@@ -705,63 +481,23 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         user = update.message.from_user
         telegram_id = user.id
         context.user_data["telegram_id"] = telegram_id
-        context.user_data["cadet_id"] = get_cadet_id_by_tele_id(
-            context.user_data["telegram_id"])
-        current_date = datetime.now().strftime("%Y-%m-%d")
-
-        if get_group_chat_id(context.user_data['tg_group_chat_id']) is None:
-            add_group(
-                context.user_data['tg_group_chat_id'], context.user_data['chat_title'])
-
-        group_id = get_group_id(context.user_data['tg_group_chat_id'])
-        if check_if_cadet_in_group(context.user_data['cadet_id'], group_id) == []:
-            add_cadet_group(context.user_data['cadet_id'], group_id)
-
-        all_cadets_act_1_info = get_all_cadets_act_1_info()
-        all_cadets_act_2_info = get_all_cadets_act_2_info()
-        all_cadets_act_3_info = get_all_cadets_act_3_info()
-        all_cadets_act_4_info = get_all_cadets_act_4_info()
-
-        print(all_cadets_act_4_info)
-
-        response = f"Cadets participating in SRT on {current_date}:\n\n"
-
-        if all_cadets_act_1_info != []:
-            act_1_info = "\n".join(
-                f"{row[0]} | {'Not checked in' if row[1] is None else f'Started at {row[1]}'}"
-                for row in all_cadets_act_1_info
-            )
-            response += f"Run - Wingline\n{act_1_info}\n\n"
-
-        if all_cadets_act_2_info != []:
-            act_2_info = "\n".join(
-                f"{row[0]} | {'Not checked in' if row[1] is None else f'Started at {row[1]}'}"
-                for row in all_cadets_act_2_info
-            )
-            response += f"Run - Yellow Cluster\n{act_2_info}\n\n"
-
-        if all_cadets_act_3_info != []:
-            act_3_info = "\n".join(
-                f"{row[0]} | {'Not checked in' if row[1] is None else f'Started at {row[1]}'}"
-                for row in all_cadets_act_3_info
-            )
-            response += f"Gym - Wingline\n{act_3_info}\n\n"
-
-        if all_cadets_act_4_info != []:
-            act_4_info = "\n".join(
-                f"{row[0]} | {'Not checked in' if row[1] is None else f'Started at {row[1]}'}"
-                for row in all_cadets_act_4_info
-            )
-            response += f"Basketball - Basketball Court\n{act_4_info}\n\n"
-
-        # If no cadet information is available for all activities
-        if response.strip() == f"Cadets participating in SRT on {current_date}:":
-            if datetime.now().hour > CUTOFF_TIME:
-                response = f"All cadets have checked out."
-            else:
-                response = f"No cadets participating in SRT."
-
-        await update.message.reply_text(response.strip())
+        context.user_data["cadet_id"] = existing_cadet[0] if existing_cadet else None
+
+        if await db.run(get_group_chat_id, context.user_data['tg_group_chat_id']) is None:
+            await db.run(
+                add_group, context.user_data['tg_group_chat_id'], context.user_data['chat_title'])
+
+        group = await db.run(get_group_id, context.user_data['tg_group_chat_id'])
+        if group is None:
+            await update.message.reply_text("Could not register this group, please try again.")
+            return
+        group_id = group[0]
+        if await db.run(check_if_cadet_in_group, context.user_data['cadet_id'], group_id) == []:
+            await db.run(add_cadet_group, context.user_data['cadet_id'], group_id)
+
+        roster = await db.run(get_roster, context.user_data['tg_group_chat_id']) or []
+
+        await update.message.reply_text(format_roster(roster))
 
 
 async def start_again(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -787,16 +523,15 @@ async def handle_name_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     username = context.user_data["username"]
 
     # Save the name to the database or validate
-    insert_cadet(telegram_id, username, cadet_name)
+    await db.run(insert_cadet, telegram_id, username, cadet_name)
 
-    context.user_data["cadet_id"] = get_cadet_id_by_tele_id(
-        context.user_data["telegram_id"])
+    context.user_data["cadet_id"] = await get_cadet_id(context.user_data["telegram_id"])
 
-    user_in_no_group = check_if_cadet_in_no_group(
-        context.user_data['cadet_id'])
+    user_in_no_group = await db.run(
+        check_if_cadet_in_no_group, context.user_data['cadet_id'])
     print('line 619:', user_in_no_group)
     if user_in_no_group == []:
-        insert_cadet_into_no_group(context.user_data['cadet_id'])
+        await db.run(insert_cadet_into_no_group, context.user_data['cadet_id'])
 
     # Redirect to the start function
     await update.message.reply_text("Thank you! Redirecting to the main menu...")
@@ -808,12 +543,8 @@ async def one(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
 
-    cadet_id = get_cadet_id_by_tele_id(context.user_data['telegram_id'])
-
-    delete_srt_info_by_cadet_id(cadet_id)
-
     # Fetch activities and show them as buttons
-    activities = get_activities()
+    activities = refdata.activities()
     if not activities:
         await query.edit_message_text("No activities found in the database.")
         return START_ROUTES
@@ -833,51 +564,17 @@ async def two(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle the View srt details option."""
     query = update.callback_query
 
-    srt_info = get_srt_info(str(context.user_data["telegram_id"]))
+    dashboard = await db.run(get_cadet_dashboard, context.user_data["telegram_id"])
+    srt_info = dashboard["details"] if dashboard else []
     date = datetime.now().strftime("%d-%m-%y")
 
-    if has_srt_record_today(context.user_data['telegram_id']):
-
-        # print("status:",check_status_exists(context.user_data['telegram_id']))
-        cadet_id = get_cadet_id_by_tele_id(context.user_data['telegram_id'])
-
-        if check_status_exists(cadet_id) == 2:
-            keyboard = [
-                [
-                    InlineKeyboardButton(
-                        "Check Out SRT", callback_data=str(FIVE)),
-                ]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(f"SRT Information:\n{srt_info}", reply_markup=reply_markup)
-
-        elif check_status_exists(cadet_id) == 1:
-            keyboard = [
-                [
-                    InlineKeyboardButton(
-                        "Check In SRT", callback_data=str(THREE)),
-                ]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(f"SRT Information for {date}:\n{srt_info}", reply_markup=reply_markup)
-        elif check_status_exists(cadet_id) == 3:
-            keyboard = [
-                [
-                    InlineKeyboardButton(
-                        "Book SRT Slot", callback_data=str(ONE)),
-                ]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(f"SRT Information for {date}:\n{srt_info}", reply_markup=reply_markup)
-
+    if dashboard and dashboard["booked_today"] and dashboard["status_id"] != refdata.status_id(ONGOING):
+        header = f"SRT Information for {date}:"
     else:
-        keyboard = [
-            [
-                InlineKeyboardButton("Book SRT Slot", callback_data=str(ONE)),
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(f"SRT Information:\n{srt_info}", reply_markup=reply_markup)
+        header = "SRT Information:"
+
+    reply_markup = build_menu_keyboard(dashboard, show_details=False)
+    await query.edit_message_text(f"{header}\n{srt_info}", reply_markup=reply_markup)
 
     return START_ROUTES
 
@@ -892,8 +589,9 @@ async def activity_selection(update: Update, context: ContextTypes.DEFAULT_TYPE)
     created_on = str(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
     await query.edit_message_text(f"SRT booking submitted.")
-    insert_srt_info(context.user_data["cadet_id"],
-                    activity_id, None, None, created_on, 1)  # 1'Pending'
+    await queue_write(record_booking, context.user_data["cadet_id"],
+                      activity_id, None, None, created_on, refdata.status_id(PENDING))
+    live_rosters.changed(context.bot)
 
     keyboard = [
         [
@@ -914,14 +612,13 @@ async def check_in(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
 
-    existing_cadet = check_cadet_exists(context.user_data['telegram_id'])
-
-    cadet_id = get_cadet_id_by_tele_id(context.user_data['telegram_id'])
+    cadet_id = await get_cadet_id(context.user_data['telegram_id'])
     datetime_in = str(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    srt_check_in(datetime_in, 2, cadet_id)
+    await queue_write(record_check_in, datetime_in, refdata.status_id(ONGOING), cadet_id)
+    live_rosters.changed(context.bot)
 
     # print(check_status_exists(cadet_id))
-    if check_status_exists(cadet_id) == 2:
+    if await db.run(check_status_exists, cadet_id) == refdata.status_id(ONGOING):
         keyboard = [
             [
                 InlineKeyboardButton("Check Out SRT", callback_data=str(FIVE)),
@@ -939,10 +636,11 @@ async def check_out(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
 
-    cadet_id = get_cadet_id_by_tele_id(context.user_data['telegram_id'])
+    cadet_id = await get_cadet_id(context.user_data['telegram_id'])
     datetime_out = str(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
-    srt_check_out(datetime_out, 3, cadet_id)
+    await queue_write(record_check_out, datetime_out, refdata.status_id(COMPLETED), cadet_id)
+    live_rosters.changed(context.bot)
 
     keyboard = [
         [
@@ -964,10 +662,195 @@ async def end(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return ConversationHandler.END
 
 
-def main():
-    """Run the bot."""
-    app = Application.builder().token(
-        "7561336720:AAEuDMvGeY9Vn1VUSQ-nnPS-SYUxhOrsprI").build()
+def get_report(period):
+    first_day, last_day = rollups.report_range(period)
+    try:
+        with pool.connection() as conn:
+            return first_day, last_day, rollups.get_report(conn, first_day, last_day)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return first_day, last_day, ([], [])
+
+
+async def report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admin command: /report for today's totals, /report week for this week's."""
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+
+    period = "week" if context.args and context.args[0].lower() == "week" else "day"
+    first_day, last_day, (activities, cadets) = await db.run(get_report, period)
+
+    if not activities:
+        await update.message.reply_text(f"No SRT sessions from {first_day} to {last_day}.")
+        return
+
+    response = f"SRT report {first_day} to {last_day}:\n\n"
+    response += f"By activity\n{rollups.format_report_rows(activities)}\n\n"
+    response += f"By cadet\n{rollups.format_report_rows(cadets)}"
+    await update.message.reply_text(response)
+
+
+def export_history(path, fmt, compress, filters):
+    try:
+        with pool.connection() as conn:
+            return exporter.export(conn, path, fmt, compress=compress, **filters)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+
+def parse_export_args(text):
+    """
+    Read /export's arguments: [csv|jsonl] [gz] [since [until]] [group=...] [activity=...].
+    Quote names with spaces, e.g. group="Flight 1".
+    """
+    fmt, compress, days, filters = "csv", False, [], {}
+    for arg in shlex.split(text)[1:]:
+        key, _, value = arg.partition("=")
+        if arg.lower() in exporter.WRITERS:
+            fmt = arg.lower()
+        elif arg.lower() == "gz":
+            compress = True
+        elif value and key.lower() in ("group", "activity"):
+            filters[key.lower()] = value
+        else:
+            days.append(date.fromisoformat(arg))
+    if len(days) > 2:
+        raise ValueError("at most two dates")
+    filters["since"] = days[0] if days else None
+    filters["until"] = days[-1] if days else None
+    return fmt, compress, filters
+
+
+async def export(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admin command: /export [csv|jsonl] [gz] [since [until]] [group=...] [activity=...] sends the history."""
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+
+    try:
+        fmt, compress, filters = parse_export_args(update.message.text)
+    except ValueError as e:
+        await update.message.reply_text(
+            f"Could not read that ({e}). Usage: /export [csv|jsonl] [gz] [YYYY-MM-DD [YYYY-MM-DD]] "
+            f'[group="name"] [activity="name"]')
+        return
+
+    # Written to disk on a DB worker, so neither memory nor the event loop scale with the history
+    filename = f"srt_history.{fmt}.gz" if compress else f"srt_history.{fmt}"
+    fd, path = tempfile.mkstemp(suffix=f"-{filename}")
+    os.close(fd)
+    try:
+        result = await db.run(export_history, path, fmt, compress, filters)
+        if result is None:
+            await update.message.reply_text("Could not read the history, please try again.")
+            return
+        logger.info("Exported %s rows in %.2fs (%s rows/s)",
+                    result["rows"], result["seconds"], result["rows_per_s"])
+        with open(path, "rb") as f:
+            await update.message.reply_document(
+                f, filename=filename,
+                caption=f"{result['rows']} rows in {result['seconds']:.2f}s.")
+    finally:
+        os.remove(path)
+
+
+async def reload_reference_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admin command to re-read the activity and status tables."""
+    if update.effective_user.id not in ADMIN_IDS:
+        return
+
+    activities, statuses = await db.run(refdata.reload)
+    await update.message.reply_text(
+        f"Reloaded {activities} activities and {statuses} statuses.")
+
+
+async def live_roster(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admin command in a group: /live posts a roster that stays current, /live off stops it."""
+    if update.effective_user.id not in ADMIN_IDS or update.effective_chat.type == "private":
+        return
+
+    chat = update.effective_chat
+    if context.args and context.args[0].lower() == "off":
+        await db.run(set_live_roster, chat.id, None)
+        await update.message.reply_text("Live roster stopped.")
+        return
+
+    if await db.run(get_group_chat_id, chat.id) is None:
+        await db.run(add_group, chat.id, chat.title)
+    text = await render_roster(chat.id)
+    if text is None:
+        await update.message.reply_text("Could not read the roster, please try again.")
+        return
+    message = await update.message.reply_text(text)
+    await db.run(set_live_roster, chat.id, message.message_id)
+    live_rosters.shown(chat.id, message.message_id, text)
+
+
+async def auto_checkout(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Close the day at CUTOFF_TIME and report what was touched to the admins."""
+    datetime_out = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    started = time.perf_counter()
+    touched = await writes.run_async(
+        close_day, datetime_out, refdata.status_id(ONGOING),
+        refdata.status_id(COMPLETED), refdata.status_id(PENDING))
+    elapsed = (time.perf_counter() - started) * 1000
+    live_rosters.changed(context.bot)
+
+    summary = (
+        f"Day closed at {datetime_out}: {touched['checked_out']} cadets checked out, "
+        f"{touched['expired_bookings']} unstarted bookings cleared, "
+        f"{touched['history_rows'] + touched['rollup_rows']} history and rollup rows "
+        f"updated in {elapsed:.1f} ms."
+    )
+    logger.info(summary)
+    for admin_id in ADMIN_IDS:
+        await context.bot.send_message(admin_id, summary)
+
+
+def maintain_storage():
+    try:
+        with pool.connection() as conn:
+            return storage.maintain(conn)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+
+async def storage_maintenance(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Checkpoint the WAL and refresh query planner statistics."""
+    result = await db.run(maintain_storage)
+    if result is not None:
+        logger.info("Storage maintenance: %s", result)
+
+
+async def log_pool_stats(application: Application) -> None:
+    """Stop the DB workers and log their counters when the bot shuts down."""
+    await live_rosters.shutdown()
+    db.close()
+    writes.close()
+    logger.info("Database queue stats: %s", db.stats())
+    logger.info("Write queue stats: %s", writes.stats())
+    logger.info("Database pool stats: %s", pool.stats())
+    logger.info("Identity cache stats: %s", identities.stats())
+    logger.info("Update processor stats: %s", updates.stats())
+    logger.info("Outbound scheduler stats: %s", outbound.stats())
+    logger.info("Live roster stats: %s", live_rosters.stats())
+    logger.info("Persistence stats: %s", application.persistence.stats())
+    if METRICS_DUMP:
+        metrics.dump(METRICS_DUMP)
+        logger.info("Metrics written to %s", METRICS_DUMP)
+    pool.close()
+
+
+def build_application(builder=None):
+    """Create the Application with every handler registered, without starting it."""
+    if builder is None:
+        builder = Application.builder().token(
+            "7561336720:AAEuDMvGeY9Vn1VUSQ-nnPS-SYUxhOrsprI"
+        ).concurrent_updates(updates).rate_limiter(outbound)
+    persistence = SQLitePersistence(
+        lambda: pool.connection(), db, writes, update_interval=PERSISTENCE_INTERVAL)
+    app = builder.persistence(persistence).post_shutdown(log_pool_stats).build()
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -990,10 +873,63 @@ def main():
 
         },
         fallbacks=[CommandHandler("start", start)],
+        name="srt",
+        persistent=True,
     )
 
     app.add_handler(conv_handler)
-    app.run_polling()
+    app.add_handler(CommandHandler("reload", reload_reference_data))
+    app.add_handler(CommandHandler("report", report))
+    app.add_handler(CommandHandler("live", live_roster))
+    app.add_handler(CommandHandler("export", export))
+    if app.job_queue is None:
+        logger.warning(
+            'Install "python-telegram-bot[job-queue]" to close the day at CUTOFF_TIME '
+            'and checkpoint the database')
+    else:
+        app.job_queue.run_daily(
+            auto_checkout,
+            dt_time(hour=CUTOFF_TIME, tzinfo=datetime.now().astimezone().tzinfo),
+            name="auto_checkout",
+        )
+        app.job_queue.run_repeating(
+            storage_maintenance,
+            interval=STORAGE_MAINTENANCE_INTERVAL,
+            first=STORAGE_MAINTENANCE_INTERVAL,
+            name="storage_maintenance",
+        )
+    metrics.instrument(app)
+    return app
+
+
+def prepare_database():
+    """Migrate the schema and load reference data before serving updates."""
+    with pool.connection() as conn:
+        logger.info("Database schema version %s", migrate(conn))
+        logger.info("Storage settings: %s", storage.applied(conn))
+        for setting, (wanted, applied) in storage.verify(conn, storage_profile).items():
+            logger.warning("Storage setting %s is %s, not %s as configured", setting, applied, wanted)
+    refdata.reload()
+
+
+def main():
+    """Run the bot."""
+    prepare_database()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+        logger.info("Metrics on http://127.0.0.1:%s/metrics", METRICS_PORT)
+    app = build_application()
+    if WEBHOOK_URL:
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            max_connections=CONCURRENT_UPDATES,
+        )
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
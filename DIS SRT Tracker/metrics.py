@@ -0,0 +1,330 @@
+import bisect
+import functools
+import json
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telegram.ext import ConversationHandler
+
+# Upper bounds in seconds, from a cached lookup to a stuck write lock
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_VERB = re.compile(r"^\s*(\w+)", re.S)
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+'?(\w+)", re.I)
+
+
+def statement_label(sql):
+    """Reduce a statement to 'VERB table', e.g. 'SELECT srt_current'."""
+    verb = _VERB.match(sql)
+    table = _TABLE.search(sql)
+    label = verb.group(1).upper() if verb else "?"
+    return f"{label} {table.group(1)}" if table else label
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        """Upper bucket bound below which a fraction `q` of observations fall."""
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    In-process latency histograms and error counters, rendered in the
+    Prometheus text format.
+
+    Handlers are timed by `instrument()`, SQL statements by connections made
+    with `connection_factory()`. Gauges from other components (pool, queues,
+    caches) are read at scrape time from the collectors passed to
+    `add_collector()`.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = []
+        self._labels = {}
+        self._factory = None
+
+    def observe(self, name, labels, seconds):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + amount
+
+    def add_collector(self, prefix, stats):
+        """Export every numeric value of `stats()` as a gauge named prefix_key."""
+        self._collectors.append((prefix, stats))
+
+    def label(self, sql):
+        label = self._labels.get(sql)
+        if label is None:
+            label = self._labels[sql] = statement_label(sql)
+        return label
+
+    # Handlers
+
+    def timed_handler(self, name, callback):
+        """Wrap a PTB callback so its latency and exceptions are recorded."""
+        labels = (("handler", name),)
+
+        @functools.wraps(callback)
+        async def timed(update, context):
+            started = time.perf_counter()
+            try:
+                return await callback(update, context)
+            except Exception:
+                self.inc("srt_handler_errors_total", labels)
+                raise
+            finally:
+                self.observe("srt_handler_seconds", labels, time.perf_counter() - started)
+
+        return timed
+
+    def instrument(self, application):
+        """Time every handler registered on `application`, including conversation states."""
+        def wrap(handler):
+            if isinstance(handler, ConversationHandler):
+                for child in handler.entry_points + handler.fallbacks:
+                    wrap(child)
+                for handlers in handler.states.values():
+                    for child in handlers:
+                        wrap(child)
+            elif not getattr(handler.callback, "__wrapped__", None):
+                handler.callback = self.timed_handler(handler.callback.__name__, handler.callback)
+
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                wrap(handler)
+
+    # SQL
+
+    def connection_factory(self):
+        """Return a sqlite3.Connection subclass whose statements are timed."""
+        if self._factory is None:
+            self._factory = _timed_connection(self)
+        return self._factory
+
+    def _record_sql(self, label, seconds):
+        self.observe("srt_sql_seconds", (("statement", label),), seconds)
+
+    def _record_sql_error(self, label, error):
+        kind = "locked" if "locked" in str(error) else type(error).__name__
+        self.inc("srt_db_errors_total", (("statement", label), ("error", kind)))
+
+    # Output
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            lines = []
+            seen = set()
+            for (name, labels), histogram in histograms:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE {name} histogram")
+                for bound, total in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {total}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            for (name, labels), value in counters:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for prefix, stats in self._collectors:
+            for key, value in stats().items():
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Return a JSON-friendly summary: count, total and p50/p95/p99 per series."""
+        with self._lock:
+            histograms = {
+                f"{name}{_format_labels(labels)}": {
+                    "count": h.count,
+                    "sum_s": round(h.sum, 6),
+                    "p50_s": h.quantile(0.50),
+                    "p95_s": h.quantile(0.95),
+                    "p99_s": h.quantile(0.99),
+                }
+                for (name, labels), h in sorted(self._histograms.items())
+            }
+            counters = {
+                f"{name}{_format_labels(labels)}": value
+                for (name, labels), value in sorted(self._counters.items())
+            }
+        return {"histograms": histograms, "counters": counters,
+                "gauges": {prefix: stats() for prefix, stats in self._collectors}}
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2, default=str)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics on a daemon thread. Returns the server; call shutdown() to stop it."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="srt-metrics", daemon=True).start()
+        return server
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _timed_connection(metrics):
+    class TimedCursor(sqlite3.Cursor):
+        # One sample per statement: its execute plus every fetch or iteration
+        # over its rows, recorded once the rows run out or the cursor is done
+        label = None
+        elapsed = 0.0
+
+        def _timed(self, method, *args):
+            started = time.perf_counter()
+            try:
+                return method(*args)
+            except sqlite3.Error as e:
+                metrics._record_sql_error(self.label, e)
+                raise
+            finally:
+                self.elapsed += time.perf_counter() - started
+
+        def _start(self, label, method, *args):
+            self._finish()
+            self.label, self.elapsed = label, 0.0
+            try:
+                self._timed(method, *args)
+            except BaseException:
+                self._finish()
+                raise
+            if self.description is None:
+                self._finish()
+            return self
+
+        def _finish(self):
+            if self.label is not None:
+                metrics._record_sql(self.label, self.elapsed)
+                self.label = None
+
+        def execute(self, sql, parameters=()):
+            return self._start(metrics.label(sql), super().execute, sql, parameters)
+
+        def executemany(self, sql, seq_of_parameters):
+            return self._start(metrics.label(sql), super().executemany, sql, seq_of_parameters)
+
+        def executescript(self, sql_script):
+            return self._start("SCRIPT", super().executescript, sql_script)
+
+        def fetchone(self):
+            row = self._timed(super().fetchone)
+            if row is None:
+                self._finish()
+            return row
+
+        def fetchmany(self, size=None):
+            size = size or self.arraysize
+            rows = self._timed(super().fetchmany, size)
+            if len(rows) < size:
+                self._finish()
+            return rows
+
+        def fetchall(self):
+            rows = self._timed(super().fetchall)
+            self._finish()
+            return rows
+
+        def __next__(self):
+            try:
+                return self._timed(super().__next__)
+            except StopIteration:
+                self._finish()
+                raise
+
+        def close(self):
+            self._finish()
+            super().close()
+
+        def __del__(self):
+            self._finish()
+
+    class TimedConnection(sqlite3.Connection):
+        def cursor(self, factory=TimedCursor):
+            return super().cursor(factory)
+
+        # The built-in shortcuts bypass cursor(), so route them through it
+        def execute(self, sql, parameters=()):
+            return self.cursor().execute(sql, parameters)
+
+        def executemany(self, sql, seq_of_parameters):
+            return self.cursor().executemany(sql, seq_of_parameters)
+
+        def executescript(self, sql_script):
+            return self.cursor().executescript(sql_script)
+
+        def commit(self):
+            started = time.perf_counter()
+            try:
+                super().commit()
+            except sqlite3.Error as e:
+                metrics._record_sql_error("COMMIT", e)
+                raise
+            finally:
+                metrics._record_sql("COMMIT", time.perf_counter() - started)
+
+    return TimedConnection
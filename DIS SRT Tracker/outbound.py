@@ -0,0 +1,206 @@
+import asyncio
+import time
+from datetime import timedelta
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+from telegram.ext import BaseRateLimiter
+
+# Safe to send twice if a timed-out request did reach Telegram
+IDEMPOTENT = {"editMessageText", "editMessageReplyMarkup", "answerCallbackQuery",
+              "getMe", "setWebhook", "deleteWebhook"}
+
+
+class TokenBucket:
+    """`rate` requests per second on average, up to `burst` at once."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        """Take a token and return the seconds to wait before it may be used."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def hold(self, seconds):
+        """Keep the bucket empty for `seconds`, e.g. after a flood-control error."""
+        self.reserve()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def full(self):
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class _Chat:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class _PendingEdit:
+    def __init__(self, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.waiters = []
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """
+    Throttle Bot API requests to Telegram's flood limits.
+
+    Requests to a chat go out one at a time and in order, within a per-chat
+    budget (private and group chats have different limits) and a global
+    budget for the whole bot. An edit of a message that already has an edit
+    waiting is merged into it: only the newest text is sent, and every caller
+    gets that result, so an old menu never lands after a newer one.
+
+    Flood-control errors (RetryAfter) hold the chat for the requested time
+    and retry. Network errors retry with exponential backoff; a timed-out
+    sendMessage is not retried, since Telegram may already have delivered it.
+
+    A bucket lets `burst + rate` requests through in its busiest second, so
+    the defaults keep that sum under Telegram's limits (about 30 per second
+    overall and 20 per minute per group).
+
+    Args:
+        global_rate (float): Requests per second across all chats.
+        global_burst (int): Requests the bot may send at once after a quiet spell.
+        private_rate (float): Requests per second to one private chat.
+        group_rate (float): Requests per second to one group chat.
+        burst (int): Requests a quiet chat may send at once.
+        max_retries (int): Retries before the error is raised to the handler.
+        backoff (float): First network-error retry delay in seconds, doubled each time.
+    """
+
+    def __init__(self, global_rate=25.0, global_burst=5, private_rate=1.0, group_rate=20 / 60,
+                 burst=2, max_retries=3, backoff=0.5):
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chats = {}
+        self._pending_edits = {}
+        self._stats = {"requests": 0, "sent": 0, "coalesced": 0, "throttled": 0,
+                       "retried": 0, "flood_errors": 0, "dropped": 0, "queued": 0,
+                       "peak_queued": 0}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _chat(self, chat_id):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if len(self._chats) > 1024:
+                self._chats = {key: c for key, c in self._chats.items()
+                               if c.users or not c.bucket.full()}
+            rate = self.group_rate if isinstance(chat_id, int) and chat_id < 0 else self.private_rate
+            chat = self._chats[chat_id] = _Chat(TokenBucket(rate, self.burst))
+        return chat
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if endpoint == "getUpdates":
+            # The Updater has its own retry loop for polling
+            return await callback(*args, **kwargs)
+        self._stats["requests"] += 1
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            # answerCallbackQuery, getMe, getUpdates: not counted against chat limits
+            return await self._send(callback, args, kwargs, endpoint)
+
+        edit_key = None
+        if endpoint == "editMessageText" and data.get("message_id") is not None:
+            edit_key = (chat_id, data["message_id"])
+            pending = self._pending_edits.get(edit_key)
+            if pending is not None:
+                # Still waiting its turn: send this newer text instead
+                pending.args, pending.kwargs = args, kwargs
+                waiter = asyncio.get_running_loop().create_future()
+                pending.waiters.append(waiter)
+                self._stats["coalesced"] += 1
+                return await waiter
+            pending = self._pending_edits[edit_key] = _PendingEdit(args, kwargs)
+
+        chat = self._chat(chat_id)
+        chat.users += 1
+        waiting = True
+        self._stats["queued"] += 1
+        self._stats["peak_queued"] = max(self._stats["peak_queued"], self._stats["queued"])
+        try:
+            async with chat.lock:
+                delay = max(chat.bucket.reserve(), self._global.reserve())
+                if delay > 0:
+                    self._stats["throttled"] += 1
+                    await asyncio.sleep(delay)
+
+                waiters = []
+                if edit_key is not None:
+                    del self._pending_edits[edit_key]
+                    args, kwargs, waiters = pending.args, pending.kwargs, pending.waiters
+                waiting = False
+                self._stats["queued"] -= 1
+                try:
+                    result = await self._send(callback, args, kwargs, endpoint, chat)
+                except BaseException as e:
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                    raise
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(result)
+                return result
+        finally:
+            if waiting:
+                # Cancelled before its turn came
+                self._stats["queued"] -= 1
+                if edit_key is not None and self._pending_edits.get(edit_key) is pending:
+                    del self._pending_edits[edit_key]
+                    for waiter in pending.waiters:
+                        waiter.cancel()
+            chat.users -= 1
+
+    async def _send(self, callback, args, kwargs, endpoint, chat=None):
+        attempt = 0
+        while True:
+            try:
+                result = await callback(*args, **kwargs)
+                self._stats["sent"] += 1
+                return result
+            except RetryAfter as e:
+                self._stats["flood_errors"] += 1
+                retry_after = e.retry_after
+                delay = (retry_after.total_seconds() if isinstance(retry_after, timedelta)
+                         else float(retry_after))
+                if chat is not None:
+                    chat.bucket.hold(delay)
+                error = e
+            except BadRequest:
+                raise
+            except TimedOut as e:
+                if endpoint not in IDEMPOTENT:
+                    raise
+                delay, error = self.backoff * 2 ** attempt, e
+            except NetworkError as e:
+                delay, error = self.backoff * 2 ** attempt, e
+
+            if attempt >= self.max_retries:
+                self._stats["dropped"] += 1
+                raise error
+            attempt += 1
+            self._stats["retried"] += 1
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return dict(self._stats, chats=len(self._chats),
+                    pending_edits=len(self._pending_edits))
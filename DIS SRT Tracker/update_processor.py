@@ -0,0 +1,78 @@
+import logging
+from collections import deque
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class CadetUpdateProcessor(BaseUpdateProcessor):
+    """
+    Process updates from different cadets concurrently, but each cadet's
+    updates strictly one after another and in arrival order.
+
+    The ConversationHandler state, `context.user_data` and the cadet's
+    srt_current row are only safe to touch from one update at a time, so an
+    update that arrives while the same telegram_id is still being served is
+    parked in that cadet's backlog. The task already serving the cadet runs
+    it next, so a parked update does not hold one of the
+    `max_concurrent_updates` slots and a cadet tapping quickly cannot starve
+    everyone else.
+
+    Args:
+        max_concurrent_updates (int): Cadets (and keyless updates) served at once.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._backlogs = {}
+        self._stats = {"updates": 0, "parked": 0, "longest_backlog": 0}
+
+    @staticmethod
+    def key(update):
+        """The telegram_id updates are serialized on, or None to run freely."""
+        if isinstance(update, Update):
+            if update.effective_user is not None:
+                return update.effective_user.id
+            if update.effective_chat is not None:
+                return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        self._stats["updates"] += 1
+        key = self.key(update)
+        if key is None:
+            await coroutine
+            return
+
+        backlog = self._backlogs.get(key)
+        if backlog is not None:
+            backlog.append(coroutine)
+            self._stats["parked"] += 1
+            self._stats["longest_backlog"] = max(self._stats["longest_backlog"], len(backlog))
+            return
+
+        backlog = self._backlogs[key] = deque([coroutine])
+        try:
+            while backlog:
+                try:
+                    await backlog.popleft()
+                except Exception:
+                    # Application.process_update reports handler errors itself;
+                    # whatever escapes must not strand the rest of the backlog
+                    logger.exception("Update for %s failed", key)
+        finally:
+            del self._backlogs[key]
+            for pending in backlog:
+                pending.close()
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self):
+        return dict(self._stats, cadets_busy=len(self._backlogs),
+                    in_flight=self.current_concurrent_updates)